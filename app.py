@@ -3,156 +3,278 @@
 import argparse
 import logging
 import json
-from unidecode import unidecode
 from os import listdir
 from os.path import isfile, join
 from config.config_manager import config
-from services.vector_service import VectorDatabaseManager
-from services.kafka_service import create_kafka_consumer, create_kafka_producer, send_message, receive_messages
+from services.kafka_service import create_kafka_consumer, create_kafka_producer, send_message
+from services.kafka_engine import KafkaConsumerEngine
 from llms.llm_config import llm_config
 from services.llm_processing import LLMProcessor
-from services.document_management import DocumentManager
+from services.content_watcher import ContentWatcher
+from services.audio_pipeline import AudioPipeline
+from services.batch_runner import BatchRunner, Checkpoint
+from services.result_sink import open_sink
+from services.json_extractor import json_parse_stats
 from utilities.helpers import top_words, pretty_print_json, transcribe_audio
+from utilities.http_client import endpoint_metrics
+from utilities.metrics import MetricsServer, metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Instantiate the manager
-vector_db_manager = VectorDatabaseManager(content_directory='content', model_name='sentence-transformers/all-mpnet-base-v2')
-
-# Create a DocumentManager instance using the existing vector_db_manager
-doc_manager = DocumentManager(vector_db_manager)
-
-# Create an instance of the LLMProcessor
-processor = LLMProcessor()
+# The heavy objects are created on first use, so `--help` and runs without --vector-memory
+# never import torch, FAISS or the embedding model
+_vector_db_manager = None
+_doc_manager = None
+_processor = None
+
+def get_vector_db_manager():
+    """Return the VectorDatabaseManager, instantiating it (and importing torch and FAISS) on first use."""
+    global _vector_db_manager
+    if _vector_db_manager is None:
+        from services.vector_service import VectorDatabaseManager
+        _vector_db_manager = VectorDatabaseManager(content_directory='content', model_name='sentence-transformers/all-mpnet-base-v2', index_directory=config.vector_index_directory,
+                                                   query_cache_size=config.query_cache_size, result_cache_size=config.result_cache_size)
+    return _vector_db_manager
+
+def get_doc_manager():
+    """Return the DocumentManager wrapping the vector database manager."""
+    global _doc_manager
+    if _doc_manager is None:
+        from services.document_management import DocumentManager
+        _doc_manager = DocumentManager(get_vector_db_manager())
+    return _doc_manager
+
+def get_processor():
+    """Return the shared LLMProcessor."""
+    global _processor
+    if _processor is None:
+        _processor = LLMProcessor()
+    return _processor
 
 def parse_args():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(description="Run the AI model in local or Kafka mode.")
     parser.add_argument("--local-mode", action="store_true", help="Run the application in local mode without Kafka.")
     parser.add_argument("--vector-memory", action="store_true", help="Run the application with a FAISS vector store")
+    parser.add_argument("--index-type", type=str, default=config.vector_index_type, choices=["flat", "ivf_flat", "ivf_pq", "hnsw"], help="FAISS index type of the vector store.")
+    parser.add_argument("--streaming-ingest", action="store_true", help="Build the FAISS vector store with the batched, multi-process ingest pipeline.")
+    parser.add_argument("--embed-batch-size", type=int, default=256, help="Number of chunks embedded per batch in streaming ingest.")
+    parser.add_argument("--ingest-workers", type=int, default=None, help="Processes loading and splitting markdown files in streaming ingest (defaults to the CPU count).")
+    parser.add_argument("--embed-multi-process", action="store_true", help="Encode chunks with a sentence-transformers multi-process pool in streaming ingest.")
+    parser.add_argument("--watch-content", action="store_true", help="Keep the FAISS vector store in sync with the content directory while running.")
     parser.add_argument("--audio-enabled", action="store_true", help="Run the application with suppor to audio files")
+    parser.add_argument("--transcription-workers", type=int, default=config.audio_transcription_workers, help="Number of concurrent transcription requests for audio files.")
     parser.add_argument("--directory-path", type=str, default="data/conversations", help="Directory path for local mode data processing.")
+    parser.add_argument("--workers", type=int, default=config.kafka_workers, help="Number of Kafka records (Kafka mode) or files (local mode) processed concurrently.")
+    parser.add_argument("--output", type=str, default=None, help="File the local mode results are appended to: CSV for a .csv path, a directory of Parquet or Arrow files for a .parquet or .arrow path, JSON lines otherwise.")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Manifest of the files done in local mode, skipped when the run restarts (defaults to the output path + .checkpoint.jsonl).")
+    parser.add_argument("--checkpoint-every", type=int, default=config.checkpoint_interval, help="Files whose results are written between two checkpoint commits in local mode.")
+    parser.add_argument("--max-records", type=int, default=config.kafka_max_records, help="Maximum number of Kafka records pulled per poll in Kafka mode.")
+    parser.add_argument("--combined-prompt", action="store_true", help="Extract data, intent, sentiment and summary with a single LLM call per text conversation (audio transcriptions keep the separate chains).")
+    parser.add_argument("--llm-cache", type=str, default=config.llm_cache_path, help="SQLite file caching LLM responses across runs (disabled when empty).")
+    parser.add_argument("--stream-events", action="store_true", help="Publish partial results (streamed summary, then each extracted field) to the producer topic as they are generated, in Kafka mode.")
+    parser.add_argument("--metrics-port", type=int, default=config.metrics_port, help="Serve Prometheus metrics of the pipeline stages at http://127.0.0.1:<port>/metrics (disabled when 0).")
+    parser.add_argument("--trace-file", type=str, default=config.metrics_trace_path, help="Append a JSON trace of the stage timings of every conversation to this file.")
+    parser.add_argument("--llm-concurrency", type=int, default=config.llm_concurrency, help="Number of LLM chains run concurrently per conversation (1 runs them serially).")
     return parser.parse_args()
 
-def handle_message(message):
-    """Process messages received from Kafka."""
-    response = llm_config.invoke(message.value['conversation'])
-    # pretty_print_json(response)  # For demonstration, print the processed result
-    # send_message(producer, config.producer_topic, response)
+def process_conversation(conversation_text, use_vector_memory=False, on_event=None):
+    """Analyze a conversation and attach related documents to information requests.
 
-def process_conversation(conversation_text, use_vector_memory=False):
+    on_event, when given, receives (conversation_id, field, value, final) for each partial result.
+    """
     if conversation_text:
-        llm_processed_output = processor.process_text_and_extract_data(conversation_text)
-
-        result = json.loads(llm_processed_output)
-        if result.get("intent") == "Information Request":
-            logging.info("Information Request found")
-            top = top_words(llm_processed_output)
-            logging.info(f"Top words Output for {top}")
-
-            # Retrieve documents based on the first keyword (most frequent)
-            if top and use_vector_memory :  # Ensure there is at least one keyword
-                # Remover acentos do primeiro item mais frequente
-                keyword = unidecode(top[0][0]) if top and top[0] else None
-                documents = doc_manager.retrieve_documents(keyword)
-
-                # Check if documents DataFrame is not empty
-                if not documents.empty:
-                    logging.info(f"Documents retrieved: {documents}")
-                    # Convert DataFrame to JSON
-                    documents_json = documents.to_json(orient='records')
-
-                    # Save JSON string in the result dictionary
-                    result["related_documents"] = json.loads(documents_json)
-                else:
-                    logging.info("No relevant documents were found for the top keyword.")
-            else:
-                logging.info("No keywords were extracted, thus no documents can be retrieved.")
+        with metrics.trace() as trace:
+            result = analyze_conversation(conversation_text, use_vector_memory, on_event)
+            trace.set(conversation_id=result.get("conversation_id"), intent=result.get("intent"))
         return result
 
-def run_kafka_mode(directory_path, use_vector_memory=False, audio_enabled=False):
-    """Set up and process data using Kafka consumers and producers."""
-    # Initialize Kafka Producer
-    producer = create_kafka_producer()
-
-    files = [join(directory_path, f) for f in listdir(directory_path) if isfile(join(directory_path, f)) and f.endswith('.txt')]
-
+def analyze_conversation(conversation_text, use_vector_memory=False, on_event=None):
+    """Stages of process_conversation: the LLM chains, then the related documents of information requests."""
+    llm_processed_output = get_processor().process_text_and_extract_data(conversation_text, on_event)
+
+    result = json.loads(llm_processed_output)
+    if result.get("intent") == "Information Request":
+        logging.info("Information Request found")
+        top = top_words(result)
+        logging.info(f"Top words Output for {top}")
+
+        # Retrieve documents for all the keywords and the extracted issue in one hybrid search
+        data = result.get("data") or {}
+        queries = [word for word, _ in top] + [
+            data[field] for field in ("issue", "detailed_description") if isinstance(data.get(field), str)
+        ]
+        if queries and use_vector_memory:  # Ensure there is at least one query
+            documents = get_doc_manager().retrieve_related_documents(queries)
+
+            # Check if any document was retrieved
+            if documents:
+                logging.info(f"Documents retrieved: {documents}")
+                # The records are plain dictionaries and go straight into the result
+                result["related_documents"] = documents
+                if on_event is not None:
+                    on_event(result["conversation_id"], "related_documents", documents, True)
+            else:
+                logging.info("No relevant documents were found for the keywords and issue.")
+        else:
+            logging.info("No keywords were extracted, thus no documents can be retrieved.")
+    return result
+
+def transcribe_file(file_path):
+    """Transcription stage of the audio pipeline."""
+    logging.info(f"Processing audio file: {file_path}")
+    processed_audio = transcribe_audio(tts_server=config.tts_server, file_path=file_path)
+    if processed_audio is None:
+        raise RuntimeError("the transcription server returned no result")
+    return json.loads(processed_audio).get("transcription")
+
+def process_transcription(file_path, audio_transcription):
+    """LLM stage of the audio pipeline."""
+    logging.info(f"Transcription: {audio_transcription}")
+
+    audio_result = get_processor().process_audio_and_extract_data(audio_transcription)
+    # audio_json=llm_config.invoke(audio_transcription, template_type='audio_extraction')
+    print(audio_result)
+
+def run_audio_pipeline(directory_path, transcription_workers=None):
+    """Transcribe the .wav files of the directory concurrently, overlapping with the LLM processing."""
+    audio = [join(directory_path, f) for f in listdir(directory_path) if isfile(join(directory_path, f)) and f.endswith('.wav')]
+
+    pipeline = AudioPipeline(
+        transcribe_file, process_transcription,
+        transcription_workers=transcription_workers or config.audio_transcription_workers,
+        queue_size=config.audio_queue_size
+    )
+    pipeline.run(audio)
+
+def run_kafka_mode(directory_path, use_vector_memory=False, audio_enabled=False, workers=4, max_records=16, transcription_workers=None, stream_events=False):
+    """Consume conversations from Kafka, process them on a worker pool and publish the results.
+
+    With stream_events, partial results are published to the producer topic as they are generated, as
+    {"event": "partial", "conversation_id", "field", "value", "final"} messages ahead of the full result.
+    """
     if audio_enabled:
-        audio = [join(directory_path, f) for f in listdir(directory_path) if isfile(join(directory_path, f)) and f.endswith('.wav')]
-
-        for file_path in audio:
-            logging.info(f"Processing audio file: {file_path}")
-            processed_audio = transcribe_audio(tts_server=config.tts_server, file_path=file_path)
-
-            audio_transcription = json.loads(processed_audio).get("transcription")
-            logging.info(f"Transcription: {audio_transcription}")
-
-            audio_result = processor.process_audio_and_extract_data(audio_transcription)
-            # audio_json=llm_config.invoke(audio_transcription, template_type='audio_extraction')
-            print(audio_result)
-
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                conversation_text = file.read().strip()
-                logging.info(f"Processing text file: {file_path}")
-
-                # Process each conversation text
-                result = process_conversation(conversation_text, use_vector_memory)
-
-                # Send processed result to Kafka
-                send_message(producer, config.producer_topic, result)
-
-                logging.info(f"Processed Output for {file_path}: {pretty_print_json(result)}")
-
-        except Exception as e:
-            logging.error(f"Failed to process file {file_path}: {e}")
+        run_audio_pipeline(directory_path, transcription_workers)
+
+    def publish_partial(conversation_id, field, value, final):
+        send_message(producer, config.producer_topic, {
+            "event": "partial", "conversation_id": conversation_id, "field": field, "value": value, "final": final
+        })
+
+    def process_message(value):
+        conversation_text = (value.get('conversation') or '').strip()
+        logging.info("Processing conversation received from Kafka")
+        result = process_conversation(conversation_text, use_vector_memory, publish_partial if stream_events else None)
+        if result is not None:
+            logging.info(f"Processed Output: {pretty_print_json(result)}")
+        return result
 
-def run_local_mode(directory_path, use_vector_memory=False, audio_enabled=False):
-    """Process all text files in the given directory as conversations."""
+    # Offsets are committed by the engine once the results of a batch are produced
+    consumer = create_kafka_consumer(config.consumer_topic, group_id=config.consumer_group, enable_auto_commit=False, max_poll_records=max_records)
+    producer = create_kafka_producer()
+    engine = KafkaConsumerEngine(
+        consumer, producer, process_message, config.producer_topic, workers=workers, max_records=max_records,
+        dead_letter_topic=config.dead_letter_topic, max_attempts=config.kafka_max_attempts, retry_backoff=config.kafka_retry_backoff
+    )
+
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        logging.info("Stopping Kafka consumer.")
+    finally:
+        engine.close()
+
+def run_local_mode(directory_path, use_vector_memory=False, audio_enabled=False, transcription_workers=None, workers=4, output=None, checkpoint=None,
+                   checkpoint_every=16):
+    """Process all text files in the given directory as conversations, workers files at a time.
+
+    With output, each result is appended to the file as soon as it is ready, and the files done are
+    recorded in the checkpoint manifest every checkpoint_every files so that a restarted run skips them.
+    """
     
     if audio_enabled:
-        audio = [join(directory_path, f) for f in listdir(directory_path) if isfile(join(directory_path, f)) and f.endswith('.wav')]
-
-        for file_path in audio:
-            logging.info(f"Processing audio file: {file_path}")
-            processed_audio = transcribe_audio(tts_server=config.tts_server, file_path=file_path)
-
-            audio_transcription = json.loads(processed_audio).get("transcription")
-            logging.info(f"Transcription: {audio_transcription}")
-
-            audio_result = processor.process_audio_and_extract_data(audio_transcription)
-            # audio_json=llm_config.invoke(audio_transcription, template_type='audio_extraction')
-            print(audio_result)
+        run_audio_pipeline(directory_path, transcription_workers)
 
     files = [join(directory_path, f) for f in listdir(directory_path) if isfile(join(directory_path, f)) and f.endswith('.txt')]
-    
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                conversation_text = file.read().strip()
-                logging.info(f"Processing file: {file_path}")
-                result = process_conversation(conversation_text, use_vector_memory)
-                logging.info(f"Processed Output for {file_path}: {pretty_print_json(result)}")
 
-        except Exception as e:
-            logging.error(f"Failed to process file {file_path}: {e}")
+    def process_file(file_path):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            conversation_text = file.read().strip()
+        logging.info(f"Processing file: {file_path}")
+        result = process_conversation(conversation_text, use_vector_memory)
+        logging.info(f"Processed Output for {file_path}: {pretty_print_json(result)}")
+        return result
+
+    if output is None:
+        BatchRunner(process_file, workers=workers).run(files)
+        return
+
+    sink = open_sink(output, batch_rows=config.result_batch_rows)
+    try:
+        checkpoint = Checkpoint(checkpoint or output + ".checkpoint.jsonl")
+        BatchRunner(process_file, sink, checkpoint, workers=workers, checkpoint_every=checkpoint_every).run(files)
+    finally:
+        sink.close()
+
+def pipeline_metrics():
+    """Samples of the statistics kept outside the metrics registry, read at every scrape of /metrics."""
+    for endpoint, stats in endpoint_metrics.snapshot().items():
+        labels = {"endpoint": endpoint}
+        yield "http_requests_total", "counter", labels, stats["count"]
+        yield "http_request_errors_total", "counter", labels, stats["errors"]
+        yield "http_request_seconds_total", "counter", labels, stats["total_seconds"]
+    parse_stats = json_parse_stats.snapshot()
+    for outcome in ("parsed", "repaired", "failed"):
+        yield "llm_json_outputs_total", "counter", {"outcome": outcome}, parse_stats[outcome]
+    if llm_config.cache is not None:
+        cache_stats = llm_config.cache.stats()
+        for counter in ("hits", "misses", "evictions"):
+            yield f"llm_cache_{counter}_total", "counter", {}, cache_stats[counter]
+        yield "llm_cache_entries", "gauge", {}, cache_stats["size"]
 
 def main():
     args = parse_args()
+    if args.metrics_port or args.trace_file:
+        metrics.enable(trace_path=args.trace_file)
+        metrics.add_collector(pipeline_metrics)
+        if args.metrics_port:
+            MetricsServer(metrics, args.metrics_port).start()
+    processor = get_processor()
+    processor.max_concurrency = max(1, args.llm_concurrency)
+    processor.combined = args.combined_prompt
+    if args.llm_cache:
+        llm_config.enable_cache(args.llm_cache, max_entries=config.llm_cache_max_entries, ttl_seconds=config.llm_cache_ttl or None)
 
     # Initialize the vector database with content from markdown files
     if args.vector_memory:
+        vector_db_manager = get_vector_db_manager()
+        vector_db_manager.index_type = args.index_type
+        vector_db_manager.nlist = config.vector_nlist
+        vector_db_manager.nprobe = config.vector_nprobe
+        vector_db_manager.ef_search = config.vector_ef_search
+        vector_db_manager.streaming_ingest = args.streaming_ingest
+        vector_db_manager.embed_batch_size = args.embed_batch_size
+        vector_db_manager.ingest_workers = args.ingest_workers
+        vector_db_manager.multi_process_embeddings = args.embed_multi_process
         index, file_paths = vector_db_manager.initialize()
         # doc_manager.retrieve_documents("kafka")
+        if args.watch_content:
+            ContentWatcher(vector_db_manager, interval=config.content_watch_interval).start()
     
-    if args.local_mode:
-        logging.info("Running in local mode.")
-        run_local_mode(args.directory_path, args.vector_memory, args.audio_enabled)
-    else:
-        logging.info("Running in Kafka mode.")
-        run_kafka_mode(args.directory_path, args.vector_memory, args.audio_enabled)
+    try:
+        if args.local_mode:
+            logging.info("Running in local mode.")
+            run_local_mode(args.directory_path, args.vector_memory, args.audio_enabled, args.transcription_workers, args.workers, args.output, args.checkpoint, args.checkpoint_every)
+        else:
+            logging.info("Running in Kafka mode.")
+            run_kafka_mode(args.directory_path, args.vector_memory, args.audio_enabled, args.workers, args.max_records, args.transcription_workers, args.stream_events)
+    finally:
+        logging.info(f"HTTP endpoint latency: {endpoint_metrics.snapshot()}")
+        logging.info(f"LLM output JSON parsing: {json_parse_stats.snapshot()}")
+        if llm_config.cache is not None:
+            logging.info(f"LLM response cache: {llm_config.cache.stats()}")
+            llm_config.cache.close()
 
 if __name__ == "__main__":
     main()
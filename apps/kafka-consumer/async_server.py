@@ -0,0 +1,222 @@
+# async_server.py
+# asyncio serving mode of the dashboard, for thousands of concurrent SSE clients. It serves the same
+# /stream, /history and /messages routes as consumer.py from a single event loop: one aiokafka consumer
+# feeds an EventBroker that numbers the events, keeps the most recent ones for Last-Event-ID resume and
+# broadcasts them to the per-client queues.
+#
+#   pip install starlette uvicorn jinja2 aiokafka
+#   python async_server.py --port 8000 [--test]
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+from collections import deque
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from events import decode_message, chat_json_response, format_message, simulated_events, sse_event
+from history import HistoryBuffer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOPIC_NAME = "answer"
+TEST_JSON_PATH = os.path.join(BASE_DIR, "test_data", "test.json")
+# Milliseconds the browser waits before reconnecting; it then sends the Last-Event-ID header
+RECONNECT_MS = 3000
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the dashboard from an asyncio (ASGI) server.")
+    parser.add_argument("--test", action="store_true", help="Publish the static JSON test data instead of consuming Kafka.")
+    parser.add_argument("--test-interval", type=float, default=10, help="Seconds between two simulated conversations in test mode.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--bootstrap-servers", type=str, default="localhost:9092", help="Kafka bootstrap servers.")
+    parser.add_argument("--heartbeat", type=float, default=15, help="Seconds without events after which a keep-alive comment is sent.")
+    parser.add_argument("--history-size", type=int, default=1000, help="Recent events kept for Last-Event-ID resume.")
+    parser.add_argument("--history-records", type=int, default=500, help="Last results kept in memory and served by /history.")
+    parser.add_argument("--history-file", type=str, default=None, help="Append-only file the /history records are spilled to and reloaded from on start.")
+    parser.add_argument("--client-queue-size", type=int, default=100, help="Events buffered per client before the oldest ones are dropped.")
+    return parser.parse_args()
+
+class EventBroker:
+    """Numbers the dashboard events, keeps the last ones in a ring buffer and broadcasts them to the clients.
+
+    Everything runs on the event loop thread, so no locking is needed. Every event carries its id, used by
+    reconnecting browsers as Last-Event-ID, and a published_at comment with the time it was published.
+    """
+
+    def __init__(self, history_size=1000, queue_size=100):
+        self.history = deque(maxlen=history_size)
+        self.queue_size = queue_size
+        self.last_id = 0
+        self.dropped = 0
+        self.subscribers = set()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event):
+        self.last_id += 1
+        event = f"id: {self.last_id}\n: published_at={time.time():.6f}\n{event}"
+        self.history.append((self.last_id, event))
+        for queue in self.subscribers:
+            # Slow clients lose their oldest events instead of holding back the others
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def replay(self, last_event_id):
+        """Events published after last_event_id that are still buffered, read from the end of the ring in O(k)."""
+        missed = min(self.last_id - last_event_id, len(self.history))
+        return [self.history[-i][1] for i in range(missed, 0, -1)] if missed > 0 else []
+
+def parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+async def consume_kafka(broker, bootstrap_servers, format_message=format_message, retry_backoff=1.0, max_retry_backoff=30.0):
+    """Publishes the result messages of the answer topic to the broker, formatted by format_message.
+
+    When the broker is unreachable or the consumer fails, it is recreated after retry_backoff seconds,
+    doubled on each failure in a row up to max_retry_backoff, so the stream resumes on its own.
+    """
+    from aiokafka import AIOKafkaConsumer
+
+    delay = retry_backoff
+    while True:
+        consumer = AIOKafkaConsumer(
+            TOPIC_NAME,
+            bootstrap_servers=bootstrap_servers,
+            auto_offset_reset="latest",
+            value_deserializer=decode_message,
+        )
+        try:
+            await consumer.start()
+            async for message in consumer:
+                delay = retry_backoff
+                if message.value is None:
+                    continue
+                try:
+                    broker.publish(format_message(message.value))
+                except Exception as e:
+                    logging.error(f"Error formatting message {message.value}: {e}")
+        except Exception as e:
+            logging.error(f"Kafka consumer failed, reconnecting in {delay:.1f}s: {e}")
+        finally:
+            try:
+                await consumer.stop()
+            except Exception as e:
+                logging.warning(f"Error stopping the Kafka consumer: {e}")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_retry_backoff)
+
+async def publish_test_data(broker, interval):
+    """Publishes the static test conversation over and over, as consumer.py does in test mode."""
+    with open(TEST_JSON_PATH, 'r') as file:
+        json_response = chat_json_response(json.load(file))
+    while True:
+        for event, delay in simulated_events(json_response, interval=interval):
+            broker.publish(event)
+            await asyncio.sleep(delay)
+
+def log_task_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"The event source stopped: {task.exception()}")
+
+def create_app(args):
+    broker = EventBroker(history_size=args.history_size, queue_size=args.client_queue_size)
+    history = HistoryBuffer(maxlen=args.history_records, spill_path=args.history_file)
+    templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+    # messages.html links its assets with Flask's url_for('static', filename=...)
+    templates.env.globals["url_for"] = lambda endpoint, filename: f"/{endpoint}/{filename}"
+
+    async def stream(request):
+        """Streams the broker events to one client, starting with the ones it missed when it reconnects."""
+        last_event_id = parse_event_id(request.headers.get("last-event-id") or request.query_params.get("last_event_id"))
+        queue = broker.subscribe()
+        backlog = broker.replay(last_event_id) if last_event_id is not None else []
+
+        async def generate_messages():
+            try:
+                yield f"retry: {RECONNECT_MS}\n\n"
+                for event in backlog:
+                    yield event
+                while True:
+                    try:
+                        yield await asyncio.wait_for(queue.get(), timeout=args.heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+            finally:
+                # Runs when the client disconnects and the response is cancelled
+                broker.unsubscribe(queue)
+
+        return StreamingResponse(
+            generate_messages(), media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    def handle_message(message_dict):
+        """Records a full result in the history and formats the message as an SSE event."""
+        if message_dict.get("event") == "partial":
+            return format_message(message_dict)
+        return sse_event(history.append(chat_json_response(message_dict)))
+
+    async def history_records(request):
+        """Returns the results after the sequence number given as ?since= (all the kept ones by default)."""
+        since = parse_event_id(request.query_params.get("since")) or 0
+        return JSONResponse({"records": history.since(since), "last_seq": history.last_seq})
+
+    async def messages(request):
+        """Renders the initial HTML page."""
+        return templates.TemplateResponse("messages.html", {"request": request})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        if args.test:
+            logging.info("##### TEST MODE #####")
+            with open(TEST_JSON_PATH, 'r') as file:
+                history.append(chat_json_response(json.load(file)))
+            task = asyncio.create_task(publish_test_data(broker, args.test_interval))
+        else:
+            task = asyncio.create_task(consume_kafka(broker, args.bootstrap_servers, handle_message))
+        task.add_done_callback(log_task_failure)
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            history.close()
+            logging.info(f"Published {broker.last_id} events, dropped {broker.dropped} for slow clients.")
+
+    app = Starlette(
+        routes=[
+            Route("/stream", stream),
+            Route("/history", history_records),
+            Route("/messages", messages),
+            Mount("/static", app=StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static"),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.broker = broker
+    return app
+
+if __name__ == "__main__":
+    args = parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="info")
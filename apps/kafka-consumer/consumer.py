@@ -1,9 +1,12 @@
-from flask import Flask, Response, render_template
+from flask import Flask, Response, jsonify, render_template, request
 from kafka import KafkaConsumer
 import json
 import argparse
+import os
 import time
-import html
+from events import decode_message, chat_json_response, format_message, simulated_events, sse_event
+from fanout import FanoutConsumer
+from history import HistoryBuffer
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description="Run Flask app in test or normal mode.")
@@ -12,6 +15,25 @@ parser.add_argument(
     action="store_true",
     help="Run the app in test mode using static JSON data.",
 )
+parser.add_argument(
+    "--client-queue-size",
+    type=int,
+    default=100,
+    help="Events buffered per dashboard client before the oldest ones are dropped.",
+)
+
+parser.add_argument(
+    "--history-records",
+    type=int,
+    default=500,
+    help="Last results kept in memory and served by /history.",
+)
+parser.add_argument(
+    "--history-file",
+    type=str,
+    default=None,
+    help="Append-only file the /history records are spilled to and reloaded from on start.",
+)
 
 args = parser.parse_args()
 
@@ -19,67 +41,31 @@ app = Flask(__name__)
 
 TOPIC_NAME="answer"
 
+# Seconds without events after which a keep-alive comment is sent, which also detects closed connections
+KEEP_ALIVE_INTERVAL = 15
+
 def create_consumer():
-    """Function to create a new KafkaConsumer instance for each request."""
+    """Creates the KafkaConsumer shared by all the dashboard clients."""
     return KafkaConsumer(
         "answer",
         bootstrap_servers=["localhost:9092"],
         auto_offset_reset="latest",
         enable_auto_commit=True,
         group_id=None,  # Using None or a unique group_id for each consumer can help avoid conflicts
-        value_deserializer=lambda x: json.loads(x.decode("utf-8")),
+        value_deserializer=decode_message,
         session_timeout_ms=6000,
         heartbeat_interval_ms=1000,
     )
 
-def preprocess_summary(summary):
-    """Preprocesses the summary text to make it more readable."""
-    # Decode HTML entities and escape sequences
-    summary = html.unescape(summary)
-    # Strip leading and trailing whitespaces and normalize newlines
-    summary = summary.strip().replace('\n', ' ').replace('\r', ' ')
-    # Optional: further processing like removing excessive whitespace
-    summary = ' '.join(summary.split())
-    
-    # Find the position of the first period and slice the summary up to that point
-    # Also, ensure that we handle cases where there's no period in the summary
-    period_index = summary.find('.')
-    if period_index != -1:
-        summary = summary[:period_index + 1]  # Include the period in the summary
-
-    # Strip leading and trailing whitespaces
-    summary = summary.strip()
-    
-    return summary
-
-def chat_json_response(message_dict):
-    """Prepares a JSON response for the frontend from the Kafka message."""
-    # Extract top-level and nested data from the message_dict
-    json_response = {
-        "id": message_dict.get("conversation_id"),
-        "conversation": message_dict.get("conversation_text"),
-        "name": message_dict['data'].get("name"),
-        "email": message_dict['data'].get("email"),
-        "phone_number": message_dict['data'].get("phone_number"),
-        "location": message_dict['data'].get("location"),
-        "department": message_dict['data'].get("department"),
-        "issue": message_dict['data'].get("issue"),
-        "service": message_dict['data'].get("service"),
-        "additional_information": message_dict['data'].get("additional_information"),
-        "detailed_description": message_dict['data'].get("detailed_description"),
-        "intent": message_dict.get("intent"),
-        "sentiment": message_dict.get("sentiment"),
-        "summary": preprocess_summary(message_dict.get("summary", "")),
-        "output_score": message_dict.get("output_score")
-    }
-
-    # Check for and include any additional fields dynamically
-    additional_fields = ["related_documents"]
-    for field in additional_fields:
-        if field in message_dict:
-            json_response[field] = message_dict[field]
-
-    return json_response
+history = HistoryBuffer(maxlen=args.history_records, spill_path=args.history_file)
+
+def handle_message(message_dict):
+    """Records a full result in the history and formats the message as an SSE event."""
+    if message_dict.get("event") == "partial":
+        return format_message(message_dict)
+    return sse_event(history.append(chat_json_response(message_dict)))
+
+fanout = FanoutConsumer(create_consumer, handle_message, queue_size=args.client_queue_size)
 
 @app.route("/stream")
 def stream():
@@ -96,27 +82,38 @@ def stream():
                 json_response = chat_json_response(data)
                 # Simulate a message stream by sleeping and yielding the test data
                 while True:
-                    yield f"data: {json.dumps(json_response)}\n\n"
-                    time.sleep(10)  # Adjust time as needed
+                    for event, delay in simulated_events(json_response, interval=10):  # Adjust time as needed
+                        yield event
+                        time.sleep(delay)
         else:
-            consumer = create_consumer()  # Create a new consumer instance for this request
-            for message in consumer:
-                try:
-                    message_dict = message.value
-                    json_response = chat_json_response(message_dict)
-
-                    # Sending only the json_response part to the client
-                    yield f"data: {json.dumps(json_response)}\n\n"
-                except json.JSONDecodeError:
-                    # Handle case where message value is not a valid JSON string
-                    print(f"Error decoding JSON for message: {message.value}")
+            subscription = fanout.subscribe()
+            try:
+                while True:
+                    event = subscription.get(timeout=KEEP_ALIVE_INTERVAL)
+                    yield event if event is not None else ": keep-alive\n\n"
+            finally:
+                # Runs when the client disconnects and the server closes the generator
+                fanout.unsubscribe(subscription)
 
     return Response(generate_messages(), mimetype="text/event-stream")
 
+@app.route("/history")
+def history_records():
+    """Returns the results after the sequence number given as ?since= (all the kept ones by default)."""
+    since = request.args.get("since", default=0, type=int)
+    return jsonify({"records": history.since(since), "last_seq": history.last_seq})
+
 @app.route("/messages")
 def messages():
     """Renders the initial HTML page."""
     return render_template("messages.html")
 
 if __name__ == "__main__":
+    if args.test:
+        with open('test_data/test.json', 'r') as file:
+            history.append(chat_json_response(json.load(file)))
+    elif os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Consume from the start, not from the first /stream request, so the history is complete.
+        # Only in the process serving requests, not in the debug reloader's parent
+        fanout.start()
     app.run(debug=True)
@@ -0,0 +1,103 @@
+# events.py
+# Formatting of the Kafka result messages into the events sent to the dashboard, shared by the
+# Flask (consumer.py) and asyncio (async_server.py) servers.
+
+import html
+import json
+
+def decode_message(value):
+    """Deserializes a Kafka message, returning None when it is not valid JSON."""
+    try:
+        return json.loads(value.decode("utf-8"))
+    except json.JSONDecodeError:
+        # Handle case where message value is not a valid JSON string
+        print(f"Error decoding JSON for message: {value}")
+        return None
+
+def preprocess_summary(summary):
+    """Preprocesses the summary text to make it more readable."""
+    # Decode HTML entities and escape sequences
+    summary = html.unescape(summary)
+    # Strip leading and trailing whitespaces and normalize newlines
+    summary = summary.strip().replace('\n', ' ').replace('\r', ' ')
+    # Optional: further processing like removing excessive whitespace
+    summary = ' '.join(summary.split())
+    
+    # Find the position of the first period and slice the summary up to that point
+    # Also, ensure that we handle cases where there's no period in the summary
+    period_index = summary.find('.')
+    if period_index != -1:
+        summary = summary[:period_index + 1]  # Include the period in the summary
+
+    # Strip leading and trailing whitespaces
+    summary = summary.strip()
+    
+    return summary
+
+def chat_json_response(message_dict):
+    """Prepares a JSON response for the frontend from the Kafka message."""
+    # Extract top-level and nested data from the message_dict
+    json_response = {
+        "id": message_dict.get("conversation_id"),
+        "conversation": message_dict.get("conversation_text"),
+        "name": message_dict['data'].get("name"),
+        "email": message_dict['data'].get("email"),
+        "phone_number": message_dict['data'].get("phone_number"),
+        "location": message_dict['data'].get("location"),
+        "department": message_dict['data'].get("department"),
+        "issue": message_dict['data'].get("issue"),
+        "service": message_dict['data'].get("service"),
+        "additional_information": message_dict['data'].get("additional_information"),
+        "detailed_description": message_dict['data'].get("detailed_description"),
+        "intent": message_dict.get("intent"),
+        "sentiment": message_dict.get("sentiment"),
+        "summary": preprocess_summary(message_dict.get("summary", "")),
+        "output_score": message_dict.get("output_score")
+    }
+
+    # Check for and include any additional fields dynamically
+    additional_fields = ["related_documents"]
+    for field in additional_fields:
+        if field in message_dict:
+            json_response[field] = message_dict[field]
+
+    return json_response
+
+def partial_json_response(message_dict):
+    """Prepares a partial result for the frontend; the field names follow chat_json_response."""
+    field = message_dict.get("field")
+    value = message_dict.get("value")
+    if field in ("conversation_text", "transcription"):
+        field = "conversation"
+    elif field == "summary" and message_dict.get("final"):
+        value = preprocess_summary(value or "")
+
+    return {
+        "id": message_dict.get("conversation_id"),
+        "field": field,
+        "value": value,
+        "final": bool(message_dict.get("final"))
+    }
+
+def sse_event(payload, event=None):
+    """Formats a Server-Sent Event; unnamed events reach the client's onmessage handler."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+def format_message(message_dict):
+    """Formats a Kafka message as the SSE event sent to every client."""
+    # Partial results published with --stream-events go out as named 'partial' events
+    if message_dict.get("event") == "partial":
+        return sse_event(partial_json_response(message_dict), "partial")
+    # Sending only the json_response part to the client
+    return sse_event(chat_json_response(message_dict))
+
+def simulated_events(json_response, interval=10):
+    """Events of the test mode as (event, seconds to wait after it) pairs: the conversation, the summary
+    streamed word by word as the --stream-events mode does, then the full result followed by interval seconds."""
+    events = [(sse_event({"id": json_response["id"], "field": "conversation", "value": json_response["conversation"], "final": True}, "partial"), 0)]
+    words = json_response["summary"].split()
+    for i in range(1, len(words) + 1):
+        events.append((sse_event({"id": json_response["id"], "field": "summary", "value": " ".join(words[:i]), "final": i == len(words)}, "partial"), 0.1))
+    events.append((sse_event(json_response), interval))
+    return events
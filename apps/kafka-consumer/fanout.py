@@ -0,0 +1,141 @@
+# fanout.py
+
+import logging
+import threading
+from collections import deque
+
+class Subscription:
+    """Bounded queue of the events waiting to be sent to one SSE client.
+
+    When the client reads slower than events arrive, the oldest events are dropped so that a slow tab
+    never holds back the consumer or the other clients.
+    """
+
+    def __init__(self, maxsize=100):
+        self._events = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, event):
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest pending event, or None when nothing arrived within timeout seconds."""
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+class FanoutConsumer:
+    """A single background Kafka consumer broadcasting every message to the subscribed SSE clients.
+
+    The consumer is created by start, or when the first client subscribes, and keeps running afterwards,
+    so the number of open dashboards does not change the number of consumers, broker connections or
+    fetch loops.
+    Each message is formatted once and the result is put in the queue of every subscriber.
+    """
+
+    def __init__(self, create_consumer, format_message, queue_size=100, poll_timeout_ms=1000, retry_backoff=1.0, max_retry_backoff=30.0):
+        """
+        Parameters:
+            create_consumer (callable): Returns the KafkaConsumer to read from.
+            format_message (callable): Turns a message value into the event sent to the clients, or None to skip it.
+            queue_size (int): Events buffered per client before the oldest ones are dropped.
+            poll_timeout_ms (int): Maximum time a poll waits for records.
+            retry_backoff (float): Seconds before reconnecting after a failure, doubled on each failure in a row.
+            max_retry_backoff (float): Upper bound of the reconnection delay.
+        """
+        self.create_consumer = create_consumer
+        self.format_message = format_message
+        self.queue_size = queue_size
+        self.poll_timeout_ms = poll_timeout_ms
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._retry_delay = retry_backoff
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the consumer thread unless it is already running."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="sse-fanout", daemon=True)
+                self._thread.start()
+
+    def subscribe(self):
+        """Registers a new client and returns its Subscription, starting the consumer thread if needed."""
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        if subscription.dropped:
+            logging.warning(f"SSE client disconnected after {subscription.dropped} events were dropped for it.")
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def run(self):
+        """Consumes until stop(), reconnecting with exponential backoff when the broker or a poll fails."""
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.consume()
+                except Exception as e:
+                    logging.error(f"Kafka consumer failed, reconnecting in {self._retry_delay:.1f}s: {e}")
+                    if self._stop_event.wait(self._retry_delay):
+                        break
+                    self._retry_delay = min(self._retry_delay * 2, self.max_retry_backoff)
+        finally:
+            # Should the thread still die, the next start() or subscriber creates a new one
+            with self._lock:
+                self._thread = None
+
+    def consume(self):
+        consumer = self.create_consumer()
+        try:
+            while not self._stop_event.is_set():
+                records = consumer.poll(timeout_ms=self.poll_timeout_ms)
+                self._retry_delay = self.retry_backoff
+                for messages in records.values():
+                    for message in messages:
+                        if message.value is None:
+                            continue
+                        try:
+                            event = self.format_message(message.value)
+                        except Exception as e:
+                            logging.error(f"Error formatting message {message.value}: {e}")
+                            continue
+                        if event is not None:
+                            self.publish(event)
+        finally:
+            consumer.close()
+
+    def stop(self):
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+# Example usage:
+# fanout = FanoutConsumer(create_consumer, lambda value: f"data: {json.dumps(value)}\n\n")
+# subscription = fanout.subscribe()
+# event = subscription.get(timeout=15)
+# fanout.unsubscribe(subscription)
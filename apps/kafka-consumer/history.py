@@ -0,0 +1,97 @@
+# history.py
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+class HistoryBuffer:
+    """The last dashboard records, numbered with an increasing sequence and kept in a bounded ring buffer.
+
+    A newly opened page asks for the records after the last sequence it knows (0 for all of them), so it
+    can backfill without rewinding Kafka offsets. With a spill file, every record is also appended to it
+    as a JSON line and the buffer is reloaded from it on start; the file is compacted to the buffered
+    records whenever it grows to twice the buffer size.
+    """
+
+    def __init__(self, maxlen=500, spill_path=None):
+        """
+        Parameters:
+            maxlen (int): Records kept in memory and served by since.
+            spill_path (str, optional): Append-only JSON lines file that survives restarts.
+        """
+        self.maxlen = maxlen
+        self.spill_path = spill_path
+        self.records = deque(maxlen=maxlen)
+        self.last_seq = 0
+        self._lock = threading.Lock()
+        self._spill_file = None
+        self._spilled_lines = 0
+        if spill_path:
+            self.load()
+            self._spill_file = open(spill_path, 'a', encoding='utf-8')
+
+    def load(self):
+        """Fills the buffer with the last records of the spill file."""
+        if not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                self._spilled_lines += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    continue
+                self.records.append(record)
+                self.last_seq = max(self.last_seq, record.get("seq", 0))
+        logging.info(f"Loaded {len(self.records)} history records from {self.spill_path}.")
+
+    def append(self, record):
+        """Stores a copy of record under the next sequence number and returns the stored copy."""
+        with self._lock:
+            self.last_seq += 1
+            record = {**record, "seq": self.last_seq}
+            self.records.append(record)
+            if self._spill_file is not None:
+                self._spill_file.write(json.dumps(record) + "\n")
+                self._spill_file.flush()
+                self._spilled_lines += 1
+                if self._spilled_lines >= 2 * self.maxlen:
+                    self.compact()
+        return record
+
+    def compact(self):
+        """Rewrites the spill file with the buffered records only. Called with the lock held."""
+        temp_path = f"{self.spill_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            for record in self.records:
+                file.write(json.dumps(record) + "\n")
+        self._spill_file.close()
+        os.replace(temp_path, self.spill_path)
+        self._spill_file = open(self.spill_path, 'a', encoding='utf-8')
+        self._spilled_lines = len(self.records)
+
+    def since(self, seq=0):
+        """Records with a sequence above seq, oldest first, read from the end of the buffer in O(k).
+
+        When seq is older than the buffer, every buffered record is returned; a gap shows as a first
+        sequence above seq + 1.
+        """
+        with self._lock:
+            # Sequences are consecutive, except across a restart without a spill file
+            missed = min(self.last_seq - seq, len(self.records))
+            records = [self.records[-i] for i in range(missed, 0, -1)] if missed > 0 else []
+        return [record for record in records if record["seq"] > seq]
+
+    def close(self):
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+# Example usage:
+# history = HistoryBuffer(maxlen=500, spill_path="history.jsonl")
+# history.append(chat_json_response(message_dict))
+# records = history.since(42)
@@ -3,11 +3,17 @@ const source = new EventSource("/stream");
 // Object to hold department counts
 const departmentCounts = {};
 
+// Partial results of the conversations still being processed, and the ids already completed
+const liveMessages = {};
+const completedMessages = new Set();
+
 let currentAudio = null;
 let currentProgressId = '';
 
 // Call this function whenever a new message is received
 function onNewMessageReceived(message) {
+    completedMessages.add(message.id);
+    delete liveMessages[message.id];
     displayChatBallon(message.id, message.sentiment, message.conversation);
     displayMessageDetails(message);
     updateTopDepartments(message.department); // Update the departments list
@@ -20,6 +26,38 @@ source.onmessage = event => {
     onNewMessageReceived(request);
 };
 
+// Backfill the results received before the page was opened
+$(function () {
+    fetch('/history')
+        .then(response => response.json())
+        .then(history => history.records.forEach(message => {
+            if (!completedMessages.has(message.id)) {
+                onNewMessageReceived(message);
+            }
+        }))
+        .catch(error => console.error('Error fetching history:', error));
+});
+
+// Partial results published while a conversation is processed (--stream-events)
+source.addEventListener('partial', event => {
+    const partial = JSON.parse(event.data);
+    if (partial.field === 'conversation') {
+        // The conversation text is the first event of a new run
+        completedMessages.delete(partial.id);
+    } else if (completedMessages.has(partial.id)) {
+        return;  // Late partial of a conversation already displayed in full
+    }
+
+    const message = liveMessages[partial.id] = liveMessages[partial.id] || { id: partial.id };
+    if (partial.field === 'data') {
+        Object.assign(message, partial.value);
+    } else {
+        message[partial.field] = partial.value;
+    }
+    message.streaming = partial.field === 'summary' && !partial.final;
+    displayPartialDetails(message);
+});
+
 function displayChatBallon(chatID, sentiment, conversation) {
     const sentimentClass = sentiment.includes("Negative") ? 'negative' : 'positive';
     const balloon = $(`<div class="speech-balloon ${sentimentClass}"><p>💬 ${chatID}</p></div>`);
@@ -106,6 +144,35 @@ function displayMessageDetails(message) {
     $('#jsonCodeBlock').html(`<pre><code>${jsonPretty}</code></pre>`);
 }
 
+function displayPartialDetails(message) {
+    // Fields that have not been produced yet are shown as pending
+    const pending = '<em>…</em>';
+    const field = name => (message[name] !== undefined && message[name] !== null) ? message[name] : pending;
+    const summary = message.summary !== undefined ? message.summary + (message.streaming ? ' ▍' : '') : pending;
+
+    const detailsHtml = `
+    <div class="message-detail-item">
+        <div class="detail-title">
+            <h4>${message.id}</h4>
+        </div>
+    </div>
+    <div class="message-detail-item"><strong>📝 Summary:</strong> ${summary}</div>
+    <div class="message-detail-item"><strong>🎯 Intent:</strong> ${field('intent')}</div>
+    <div class="message-detail-item"><strong>💭 Sentiment:</strong> ${field('sentiment')}</div>
+    <div class="message-detail-item"><strong>🧑‍💼 Name:</strong> ${field('name')}</div>
+    <div class="message-detail-item"><strong>📧 Email:</strong> ${field('email')}</div>
+    <div class="message-detail-item"><strong>📞 Phone Number:</strong> ${field('phone_number')}</div>
+    <div class="message-detail-item"><strong>🏢 Department:</strong> ${field('department')}</div>
+    <div class="message-detail-item"><strong>📄 Issue:</strong> ${field('issue')}</div>
+    <div class="message-detail-item"><strong>🛠 Service:</strong> ${field('service')}</div>
+    <div class="message-detail-item"><strong>ℹ️ Additional Information:</strong> ${field('additional_information')}</div>
+    <div class="message-detail-item"><strong>🗒 Detailed Description:</strong> ${field('detailed_description')}</div>
+    `;
+
+    $('#messageDetails').html(detailsHtml);
+    $('#jsonCodeBlock').html(`<pre><code>${JSON.stringify(message, null, 4)}</code></pre>`);
+}
+
 function updateTopDepartments(department) {
     // Increase the count for the department or add it if it doesn't exist
     if (departmentCounts[department]) {
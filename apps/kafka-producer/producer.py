@@ -10,10 +10,18 @@ folder_path = "conversation_samples"
 kafka_server = "localhost:9092"  # Change this to your Kafka server address
 producer_topic = "chat"
 
+# Batching settings: records are grouped for up to linger_ms and compressed per batch
+linger_ms = int(os.getenv("KAFKA_LINGER_MS", "5"))
+batch_size = int(os.getenv("KAFKA_BATCH_SIZE", "16384"))
+compression_type = os.getenv("KAFKA_COMPRESSION_TYPE") or None
+
 # Create a KafkaProducer instance
 producer = KafkaProducer(
     bootstrap_servers=[kafka_server],
     value_serializer=lambda x: json.dumps(x).encode("utf-8"),
+    linger_ms=linger_ms,
+    batch_size=batch_size,
+    compression_type=compression_type,
 )
 
 def send_chat_to_kafka(file_path, producer, topic):
@@ -24,30 +32,37 @@ def send_chat_to_kafka(file_path, producer, topic):
     # Format the content as a JSON object
     message = {"conversation": chat_content}
 
-    # Send the message to the Kafka topic
-    producer.send(topic, value=message)
-    producer.flush()  # Ensure the message is sent before the script exits
-
-    print("Chat content sent to Kafka topic.")
+    # Queue the message; the producer sends it in the background and the callbacks report the outcome
+    future = producer.send(topic, value=message)
+    future.add_callback(lambda metadata: print(f"Chat content from {file_path} sent to {metadata.topic}@{metadata.offset}."))
+    future.add_errback(lambda exception: print(f"Failed to send chat content from {file_path}: {exception}"))
 
 # # Execute the function
 # send_chat_to_kafka(file_path, producer, producer_topic)
 
 
 def send_chats_to_kafka(folder_path, producer, topic):
-    while True:
-        # Get list of files in the specified folder
-        file_list = os.listdir(folder_path)
-
-        for file_name in file_list:
-            file_path = os.path.join(folder_path, file_name)
-            if os.path.isfile(file_path):
-                send_chat_to_kafka(file_path, producer, topic)
-                # Sleep for 15 seconds before the next iteration
-                time.sleep(10)
-                print(
-                    "Iteration over files completed. Waiting for 15 seconds before the next iteration."
-                )
+    try:
+        while True:
+            # Get list of files in the specified folder
+            file_list = os.listdir(folder_path)
+
+            for file_name in file_list:
+                file_path = os.path.join(folder_path, file_name)
+                if os.path.isfile(file_path):
+                    send_chat_to_kafka(file_path, producer, topic)
+                    # Sleep for 15 seconds before the next iteration
+                    time.sleep(10)
+                    print(
+                        "Iteration over files completed. Waiting for 15 seconds before the next iteration."
+                    )
+
+            # Make sure the whole pass over the folder has been delivered
+            producer.flush()
+    finally:
+        # Deliver anything still queued before the script exits
+        producer.flush()
+        producer.close()
 
 # Execute the function
 send_chats_to_kafka(folder_path, producer, producer_topic)
@@ -0,0 +1,88 @@
+# bench_combined_mode.py
+#
+# Compares the four-call extraction path (extraction, intent, summary, sentiment) with the
+# single 'combined' prompt. Needs a reachable inference server (INFERENCE_SERVER_URL).
+#
+#   python benchmarks/bench_combined_mode.py --limit 5
+#
+# Token counts use the tokenizer given with --tokenizer when transformers is installed,
+# otherwise they fall back to a whitespace approximation.
+
+import argparse
+import os
+import sys
+import time
+from os import listdir
+from os.path import isfile, join
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llms.llm_config import llm_config
+from services.llm_processing import LLMProcessor
+
+FOUR_CALL_TEMPLATES = ['extraction', 'intent_classification', 'summary_classification', 'sentiment_classification']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the four-call and combined extraction modes.")
+    parser.add_argument("--samples", type=str, default="apps/kafka-producer/conversation_samples", help="Directory with conversation .txt files.")
+    parser.add_argument("--limit", type=int, default=5, help="Maximum number of conversations to run.")
+    parser.add_argument("--tokenizer", type=str, default=None, help="Hugging Face tokenizer name used to count tokens.")
+    return parser.parse_args()
+
+def make_counter(tokenizer_name):
+    """Returns a function counting the tokens of a string."""
+    if tokenizer_name:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+            return lambda text: len(tokenizer.encode(text))
+        except ImportError:
+            print("transformers is not installed, counting whitespace-separated words instead.")
+    return lambda text: len(text.split())
+
+def run_templates(processor, conversation, templates, count_tokens):
+    """Invokes each template and returns (prompt tokens, completion tokens)."""
+    prompt_tokens = 0
+    for template_type in templates:
+        chain, input_key = llm_config.get_chain(template_type)
+        prompt_tokens += count_tokens(chain.prompt.format(**{input_key: conversation}))
+    responses = processor.invoke_templates(conversation, templates)
+    completion_tokens = sum(count_tokens(response.get('text', '')) for response in responses.values())
+    return prompt_tokens, completion_tokens, responses
+
+def main():
+    args = parse_args()
+    count_tokens = make_counter(args.tokenizer)
+    processor = LLMProcessor(max_concurrency=1)
+
+    files = sorted(join(args.samples, f) for f in listdir(args.samples) if isfile(join(args.samples, f)) and f.endswith('.txt'))
+    files = files[:args.limit]
+
+    totals = {"four-call": [0, 0, 0.0, 0], "combined": [0, 0, 0.0, 0]}
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            conversation = file.read().strip()
+
+        start = time.perf_counter()
+        prompt, completion, _ = run_templates(processor, conversation, FOUR_CALL_TEMPLATES, count_tokens)
+        totals["four-call"][0] += prompt
+        totals["four-call"][1] += completion
+        totals["four-call"][2] += time.perf_counter() - start
+        totals["four-call"][3] += 1
+
+        start = time.perf_counter()
+        prompt, completion, responses = run_templates(processor, conversation, ['combined'], count_tokens)
+        totals["combined"][0] += prompt
+        totals["combined"][1] += completion
+        totals["combined"][2] += time.perf_counter() - start
+        if processor.build_combined_output(responses['combined']) is not None:
+            totals["combined"][3] += 1
+
+    print(f"Conversations: {len(files)}")
+    print(f"{'mode':<10} {'prompt tok':>11} {'output tok':>11} {'wall s':>8} {'s/conv':>8} {'parsed':>7}")
+    for mode, (prompt, completion, elapsed, parsed) in totals.items():
+        per_conversation = elapsed / len(files) if files else 0.0
+        print(f"{mode:<10} {prompt:>11} {completion:>11} {elapsed:>8.2f} {per_conversation:>8.2f} {parsed:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# bench_csv_sink.py
+#
+# Rows/sec of the result sinks on synthetic processed conversations: save_to_csv (one open and one
+# DictWriter per row) against the buffered CsvWriter, plus Parquet when pyarrow is installed.
+#
+#   python benchmarks/bench_csv_sink.py --rows 100000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from services.csv_service import CsvWriter, save_to_csv
+from services.result_sink import RESULT_COLUMNS, flatten_result, open_sink
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the CSV and columnar result sinks.")
+    parser.add_argument("--rows", type=int, default=50000, help="Results written per sink.")
+    parser.add_argument("--batch-rows", type=int, default=1000, help="Rows buffered by the buffered sinks.")
+    return parser.parse_args()
+
+def sample_result(i):
+    return {
+        "file_path": f"data/conversations/{i}.txt", "conversation_id": f"conversation-{i}",
+        "intent": "Information Request", "sentiment": "neutral", "output_score": 7,
+        "summary": "O cliente pergunta sobre o horário de atendimento da central de serviços.",
+        "data": {"name": "Maria", "email": "maria@email.com", "issue": "Horário de atendimento", "service": "Central"}
+    }
+
+def rows_per_second(write_all, rows):
+    start = time.perf_counter()
+    write_all()
+    return rows / (time.perf_counter() - start)
+
+def main():
+    args = parse_args()
+    rows = [flatten_result(sample_result(i)) for i in range(args.rows)]
+    with tempfile.TemporaryDirectory() as directory:
+        def per_row():
+            path = os.path.join(directory, "per_row.csv")
+            for row in rows:
+                save_to_csv(path, row, headers=RESULT_COLUMNS)
+
+        def buffered():
+            with CsvWriter(os.path.join(directory, "buffered.csv"), RESULT_COLUMNS, buffer_rows=args.batch_rows) as writer:
+                for row in rows:
+                    writer.write(row)
+
+        before = rows_per_second(per_row, args.rows)
+        after = rows_per_second(buffered, args.rows)
+        print(f"save_to_csv: {before:,.0f} rows/sec")
+        print(f"CsvWriter:   {after:,.0f} rows/sec ({after / before:.1f}x)")
+
+        try:
+            sink = open_sink(os.path.join(directory, "results.parquet"), batch_rows=args.batch_rows)
+        except ImportError as e:
+            print(f"Parquet skipped: {e}")
+            return
+        results = [sample_result(i) for i in range(args.rows)]
+
+        def parquet():
+            for result in results:
+                sink.write(result)
+            sink.close()
+
+        print(f"Parquet:     {rows_per_second(parquet, args.rows):,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
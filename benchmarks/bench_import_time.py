@@ -0,0 +1,74 @@
+# bench_import_time.py
+#
+# Guards the startup latency of app.py. Runs `python -X importtime -c "import app"` in a fresh
+# interpreter, reports the slowest imports and fails when a heavy dependency is imported eagerly
+# or the total import time exceeds the budget.
+#
+#   python benchmarks/bench_import_time.py --budget-ms 300
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must only be imported by the code paths that need them
+HEAVY_MODULES = ("torch", "langchain", "langchain_community", "langchain_core", "nltk", "transformers",
+                 "sentence_transformers", "faiss", "pandas", "kafka", "requests", "pyarrow", "numpy")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the import time of app.py.")
+    parser.add_argument("--module", type=str, default="app", help="Module whose import is measured.")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Maximum cumulative import time of the module.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports listed.")
+    return parser.parse_args()
+
+def import_times(module):
+    """Returns (module name, self us, cumulative us) for every import made while importing module."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{completed.stderr.splitlines()[-1] if completed.stderr else ''}")
+
+    timings = []
+    for line in completed.stderr.splitlines():
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+def help_wall_time():
+    """Wall time of `python app.py --help`, including interpreter startup."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "app.py", "--help"], cwd=REPO_ROOT, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    args = parse_args()
+    timings = import_times(args.module)
+    total_ms = next((cumulative for name, _, cumulative in timings if name == args.module), 0) / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms cumulative (budget {args.budget_ms:.0f} ms)")
+    print(f"python app.py --help: {help_wall_time():.1f} ms wall time")
+    print("Slowest imports:")
+    for name, _, cumulative in sorted(timings, key=lambda timing: timing[2], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    heavy = sorted({name.split(".")[0] for name, _, _ in timings if name.split(".")[0] in HEAVY_MODULES})
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# bench_keywords.py
+#
+# Per-call latency of the keyword extraction used to pick the vector search query. Compares the previous
+# top_words (JSON re-parse, NLTK stopwords rebuilt per call, punkt tokenizer, then unidecode) with the
+# KeywordExtractor on the processed test conversation of the dashboard.
+#
+#   python benchmarks/bench_keywords.py --repeat 2000
+#
+# The previous implementation needs nltk and unidecode (pip install nltk unidecode); it is skipped when
+# they are missing. Without the NLTK data (python -m nltk.downloader stopwords punkt_tab), both
+# implementations use the bundled stopword list below, and the previous one tokenizes without the punkt
+# sentence splitter, which makes it faster than it was: the measured speedup is then a lower bound.
+
+import argparse
+import json
+import os
+import string
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utilities.keyword_extractor import KeywordExtractor
+
+# Most frequent Portuguese stopwords, used when the NLTK stopwords corpus is not downloaded
+FALLBACK_STOPWORDS = [
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "é", "ela", "ele", "em", "entre",
+    "era", "essa", "esse", "esta", "este", "eu", "foi", "há", "isso", "já", "lhe", "mais", "mas", "me", "mesmo",
+    "meu", "minha", "muito", "na", "nas", "no", "nos", "não", "o", "os", "ou", "para", "pela", "pelo", "por",
+    "qual", "quando", "que", "se", "sem", "seu", "sua", "são", "também", "te", "tem", "um", "uma", "você"
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the keyword extraction of processed conversations.")
+    parser.add_argument("--sample", type=str, default=os.path.join(REPO_ROOT, "apps", "kafka-consumer", "test_data", "test.json"),
+                        help="Processed conversation whose json_response fields are used.")
+    parser.add_argument("--repeat", type=int, default=1000, help="Calls timed per implementation.")
+    parser.add_argument("--podium", type=int, default=3, help="Number of keywords returned.")
+    return parser.parse_args()
+
+def portuguese_stopwords():
+    """Returns the NLTK Portuguese stopwords, or FALLBACK_STOPWORDS when the corpus is not downloaded."""
+    try:
+        from nltk.corpus import stopwords
+        return stopwords.words('portuguese'), "NLTK stopwords"
+    except (ImportError, LookupError):
+        return FALLBACK_STOPWORDS, "bundled stopwords (NLTK corpus not downloaded)"
+
+def baseline_tokenizer():
+    """Returns the word_tokenize of the previous top_words, without the sentence splitter when punkt is missing."""
+    from nltk.tokenize import word_tokenize
+    try:
+        word_tokenize("teste", language='portuguese')
+        return word_tokenize, "punkt tokenizer"
+    except LookupError:
+        return lambda text, language: word_tokenize(text, language=language, preserve_line=True), "word tokenizer without punkt"
+
+def baseline_top_words(data_json, stop_list, word_tokenize, podium=3):
+    """The previous utilities.helpers.top_words followed by the unidecode step of app.py."""
+    from nltk.probability import FreqDist
+    from unidecode import unidecode
+
+    data = json.loads(data_json)
+    textual_content = " ".join([data['data'][key] for key in data['data'] if isinstance(data['data'][key], str)])
+    translator = str.maketrans('', '', string.punctuation)
+    textual_content = textual_content.translate(translator)
+    tokens = word_tokenize(textual_content, language='portuguese')
+    stop_words = set(stop_list)
+    filtered_tokens = [word for word in tokens if word.lower() not in stop_words]
+    keywords = FreqDist(filtered_tokens).most_common(3)
+    return [(unidecode(word), count) for word, count in keywords]
+
+def time_per_call(function, repeat):
+    function()  # Warm up: lazy imports and stopword loading
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    args = parse_args()
+    with open(args.sample, 'r', encoding='utf-8') as file:
+        fields = {key: value for key, value in json.load(file)["json_response"].items() if isinstance(value, str)}
+    result = {"data": fields}
+    result_json = json.dumps(result)
+
+    stop_list, stopwords_source = portuguese_stopwords()
+    print(f"Using {stopwords_source}.")
+    extractor = KeywordExtractor(stopwords=stop_list)
+    after = time_per_call(lambda: extractor.top_words(result, args.podium), args.repeat)
+    print(f"KeywordExtractor: {after:.1f} us/call -> {extractor.top_words(result, args.podium)}")
+
+    try:
+        word_tokenize, tokenizer_source = baseline_tokenizer()
+        import unidecode  # noqa: F401
+    except ImportError as e:
+        print(f"Previous top_words skipped: it needs nltk and unidecode (pip install nltk unidecode): {e}")
+        return
+    before = time_per_call(lambda: baseline_top_words(result_json, stop_list, word_tokenize, args.podium), args.repeat)
+    print(f"Previous top_words ({tokenizer_source}): {before:.1f} us/call -> "
+          f"{baseline_top_words(result_json, stop_list, word_tokenize, args.podium)}")
+    print(f"Speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench_label_matching.py
+#
+# Microbenchmark of the intent and sentiment extraction. Compares the previous per-call regex
+# implementation with the precompiled LabelMatcher over a corpus of model outputs and reports the
+# per-call latency and how often the two agree.
+#
+#   python benchmarks/bench_label_matching.py --repeat 2000
+#   python benchmarks/bench_label_matching.py --cache llm_cache.sqlite
+#
+# The built-in corpus holds outputs in the formats the intent and sentiment prompts produce. With
+# --cache, the real responses stored in the LLM response cache (LLM_CACHE_PATH) are used instead.
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.label_matcher import intent_matcher, sentiment_matcher
+
+INTENT_OUTPUTS = [
+    "Complaint",
+    "\nInformation Request",
+    "The intent of the conversation is \"Complaint\".",
+    "Category: Booking\n\nThe customer wants to schedule an appointment at the service center.",
+    "General Commentary. The person shares an opinion about the traffic lights on Avenida Paulista.",
+    "'Compliment'",
+    "A intenção da conversa é Reclamação, pois o cidadão relata a demora na manutenção dos semáforos.",
+    "Pedido de Informação",
+    "Based on the dialogue, the most relevant category is: Accusation",
+    "The conversation does not fit any of the listed categories.",
+]
+
+SENTIMENT_OUTPUTS = [
+    "\nThe sentiment of the text is \"Positive\". The text discusses a public event and the importance of maintaining "
+    "the infrastructure of the event. The text also mentions the importance of ensuring the safety of attendees and "
+    "the need for efficient communication.",
+    "Negative",
+    "The sentiment of the conversation is: Neutral. The interviewer is objective and the citizen only reports facts.",
+    "The overall tone is negative: the citizen describes a difficult situation caused by congestion and accidents.",
+    "O sentimento da conversa é negativo, pois o cidadão relata congestionamentos e acidentes.",
+    "Sentimento: Neutro",
+    "The tone is polite and professional, although the issue itself is problematic.",
+    "[Positive, Negative, Neutral]\nPositive",
+    "It is not possible to determine the sentiment.",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark intent and sentiment extraction.")
+    parser.add_argument("--repeat", type=int, default=1000, help="Passes over the corpus.")
+    parser.add_argument("--cache", type=str, default=None, help="LLM response cache whose intent and sentiment responses form the corpus.")
+    return parser.parse_args()
+
+def baseline_intent(response_text):
+    """The previous LLMProcessor.extract_single_intent."""
+    valid_intents = [
+        "Accusation", "Booking", "Information Request",
+        "General Commentary", "Complaint", "Compliment"
+    ]
+    pattern = r'(?:"|\')?(\b' + '|'.join(valid_intents) + r'\b)(?:"|\')?'
+    match = re.search(pattern, response_text, re.IGNORECASE)
+    return match.group(1) if match else "Undefined"
+
+def baseline_sentiment(text):
+    """The previous LLMProcessor.extract_sentiment."""
+    patterns = {
+        'positive': re.compile(r'\b(positive|professional|polite|encouraging|good)\b', re.IGNORECASE),
+        'negative': re.compile(r'\b(negative|problematic|difficult|bad)\b', re.IGNORECASE),
+        'neutral': re.compile(r'\b(neutral|objective|impartial|fair)\b', re.IGNORECASE)
+    }
+    for sentiment, pattern in patterns.items():
+        if pattern.search(text):
+            return sentiment
+    return 'undefined'
+
+def load_cache_corpus(path):
+    """Returns the cached (intent outputs, sentiment outputs) of an LLM response cache."""
+    import json
+    connection = sqlite3.connect(path)
+    corpus = {"intent_classification": [], "sentiment_classification": []}
+    for template_type, response in connection.execute(
+        "SELECT template_type, response FROM responses WHERE template_type IN ('intent_classification', 'sentiment_classification')"
+    ):
+        corpus[template_type].append(json.loads(response).get('text', ''))
+    connection.close()
+    return corpus["intent_classification"], corpus["sentiment_classification"]
+
+def time_per_call(function, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            function(text)
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+def main():
+    args = parse_args()
+    intent_outputs, sentiment_outputs = load_cache_corpus(args.cache) if args.cache else (INTENT_OUTPUTS, SENTIMENT_OUTPUTS)
+
+    for name, corpus, baseline, matcher in (
+        ("intent", intent_outputs, baseline_intent, intent_matcher.match),
+        ("sentiment", sentiment_outputs, baseline_sentiment, sentiment_matcher.match),
+    ):
+        if not corpus:
+            print(f"{name}: no outputs in the corpus")
+            continue
+        before = time_per_call(baseline, corpus, args.repeat)
+        after = time_per_call(matcher, corpus, args.repeat)
+        agree = sum(baseline(text).lower() == matcher(text).lower() for text in corpus)
+        print(f"{name}: {len(corpus)} outputs, {before:.2f} us/call before, {after:.2f} us/call after "
+              f"({before / after:.1f}x), same label for {agree}/{len(corpus)}")
+        for text in corpus:
+            if baseline(text).lower() != matcher(text).lower():
+                print(f"  {baseline(text)!r} -> {matcher(text)!r}: {text[:80]!r}")
+
+if __name__ == "__main__":
+    main()
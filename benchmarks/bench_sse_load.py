@@ -0,0 +1,125 @@
+# bench_sse_load.py
+#
+# Load test of the dashboard's /stream endpoint. Opens many concurrent SSE connections with raw asyncio
+# sockets, keeps them open for a while and reports how many were connected at the same time, the events
+# delivered and the delivery latency, measured from the published_at comment that
+# apps/kafka-consumer/async_server.py adds to every event. Run the server on the same host so the clocks
+# agree, e.g. in test mode with a short interval:
+#
+#   python apps/kafka-consumer/async_server.py --test --test-interval 1
+#   python benchmarks/bench_sse_load.py --connections 2000 --duration 30
+#
+# Raise the open file limit (ulimit -n) of both processes above the number of connections.
+
+import argparse
+import asyncio
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure concurrent SSE connections and event delivery latency.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Server host.")
+    parser.add_argument("--port", type=int, default=8000, help="Server port.")
+    parser.add_argument("--path", type=str, default="/stream", help="SSE endpoint.")
+    parser.add_argument("--connections", type=int, default=1000, help="Number of concurrent clients.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds each client stays connected.")
+    parser.add_argument("--ramp-up", type=int, default=200, help="Connections opened at the same time while ramping up.")
+    return parser.parse_args()
+
+class LoadStats:
+    def __init__(self):
+        self.connected = 0
+        self.peak_connected = 0
+        self.failed = 0
+        self.events = 0
+        self.latencies = []
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def read_body(reader, chunked):
+    """Yields the decoded lines of the response body, undoing the chunked transfer encoding."""
+    buffer = b""
+    while True:
+        if chunked:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                return
+            data = await reader.readexactly(size)
+            await reader.readline()
+        else:
+            data = await reader.read(65536)
+            if not data:
+                return
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8", "replace")
+
+async def client(args, stats, ramp_up, deadline):
+    async with ramp_up:
+        try:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+            writer.write((
+                f"GET {args.path} HTTP/1.1\r\nHost: {args.host}:{args.port}\r\n"
+                "Accept: text/event-stream\r\nCache-Control: no-cache\r\n\r\n"
+            ).encode())
+            await writer.drain()
+
+            status = await reader.readline()
+            if b" 200 " not in status:
+                raise ConnectionError(status.decode(errors="replace").strip())
+            chunked = False
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                chunked = chunked or header.lower().startswith(b"transfer-encoding: chunked")
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            stats.failed += 1
+            if stats.failed <= 5:
+                print(f"Connection failed: {e}")
+            return
+
+    stats.connected += 1
+    stats.peak_connected = max(stats.peak_connected, stats.connected)
+    try:
+        await asyncio.wait_for(consume(reader, chunked, stats), timeout=max(0.0, deadline - time.monotonic()))
+    except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        stats.connected -= 1
+        writer.close()
+
+async def consume(reader, chunked, stats):
+    published_at = None
+    async for line in read_body(reader, chunked):
+        if line.startswith(": published_at="):
+            published_at = float(line[len(": published_at="):])
+        elif line == "" and published_at is not None:
+            # A blank line ends the event
+            stats.latencies.append(time.time() - published_at)
+            stats.events += 1
+            published_at = None
+
+async def run(args):
+    stats = LoadStats()
+    ramp_up = asyncio.Semaphore(args.ramp_up)
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args, stats, ramp_up, deadline) for _ in range(args.connections)))
+    return stats, time.monotonic() - start
+
+def main():
+    args = parse_args()
+    stats, elapsed = asyncio.run(run(args))
+
+    print(f"Connections: {args.connections} requested, {stats.peak_connected} concurrent at peak, {stats.failed} failed")
+    print(f"Events delivered: {stats.events} in {elapsed:.1f}s ({stats.events / elapsed:.0f} events/sec)")
+    print(f"Delivery latency: p50 {stats.percentile(0.5) * 1000:.1f} ms, p95 {stats.percentile(0.95) * 1000:.1f} ms, "
+          f"p99 {stats.percentile(0.99) * 1000:.1f} ms, max {max(stats.latencies, default=0) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
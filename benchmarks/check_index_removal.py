@@ -0,0 +1,107 @@
+# check_index_removal.py
+#
+# Checks that every FAISS index type still returns the right chunks after the chunks of one document
+# are removed and new ones added, the way sync, update_document_in_index and the content watcher
+# replace a file, and times each update against the build.
+#
+#   python benchmarks/check_index_removal.py
+#
+# Each live chunk is searched with its own vector and must come back as the top result; a removed
+# chunk must never come back. A second, larger removal makes the HNSW graph compact its tombstones.
+# Exits with status 1 on a failure.
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ann_index import INDEX_TYPES, build_faiss_index, create_vector_store, default_nlist, set_search_params
+
+# Share of live chunks found first: IVF-PQ stores approximate vectors, HNSW an approximate graph
+MIN_ACCURACY = {"flat": 1.0, "ivf_flat": 1.0, "ivf_pq": 0.9, "hnsw": 0.99}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the chunks returned by each index type after removals.")
+    parser.add_argument("--vectors", type=int, default=4000, help="Number of random chunk vectors.")
+    parser.add_argument("--dimension", type=int, default=96, help="Dimension of the vectors (a multiple of the PQ size, 48).")
+    parser.add_argument("--document-chunks", type=int, default=50, help="Chunks of the replaced document.")
+    return parser.parse_args()
+
+def verify(store, vectors, live, removed, index_type):
+    """Searches every vector and returns the share of live chunks found first and the failures."""
+    failures = []
+    if len(store.index_to_docstore_id) != len(live):
+        failures.append(f"{len(store.index_to_docstore_id)} labels for {len(live)} live chunks")
+
+    ids = list(vectors)
+    _, labels = store.search_labels(np.array([vectors[chunk_id] for chunk_id in ids], dtype=np.float32), 1)
+    found = 0
+    for chunk_id, label in zip(ids, labels[:, 0]):
+        doc_id = store.index_to_docstore_id.get(int(label))
+        if doc_id is None:
+            failures.append(f"label {label} has no chunk")
+            continue
+        if doc_id in removed:
+            failures.append(f"removed {doc_id} returned")
+        elif store.docstore.search(doc_id).page_content != doc_id:
+            failures.append(f"label {label} maps to the wrong document")
+        if chunk_id in live and doc_id == chunk_id:
+            found += 1
+
+    accuracy = found / len(live)
+    if accuracy < MIN_ACCURACY[index_type]:
+        failures.append(f"{accuracy:.3f} of the live chunks found first")
+    return accuracy, failures
+
+def check(index_type, matrix, document_chunks):
+    # Search every list, so IVF results are exact and only the updates are checked
+    nprobe = default_nlist(len(matrix))
+    start = time.perf_counter()
+    index = build_faiss_index(index_type, matrix.shape[1], matrix)
+    set_search_params(index, nprobe=nprobe, ef_search=256)
+    store = create_vector_store(None, index)
+    vectors = {f"chunk-{i}": vector for i, vector in enumerate(matrix.tolist())}
+    store.add_embeddings([(chunk_id, vector) for chunk_id, vector in vectors.items()], ids=list(vectors))
+    build_seconds = time.perf_counter() - start
+
+    ids = list(vectors)
+    # The replaced document sits in the middle, and its new version gets new vectors
+    middle = len(ids) // 2
+    removed = set(ids[middle:middle + document_chunks])
+    added = {f"new-{i}": vector for i, vector in enumerate(np.random.default_rng(1).standard_normal((document_chunks, matrix.shape[1])).tolist())}
+    start = time.perf_counter()
+    store.delete(list(removed))
+    store.add_embeddings(list(added.items()), ids=list(added))
+    update_seconds = time.perf_counter() - start
+    vectors.update(added)
+    live = set(vectors) - removed
+    accuracy, failures = verify(store, vectors, live, removed, index_type)
+
+    # Removing a quarter of the chunks compacts the HNSW graph
+    dropped = set(ids[:len(ids) // 4])
+    store.delete(list(dropped))
+    removed |= dropped
+    live -= dropped
+    _, compacted_failures = verify(store, vectors, live, removed, index_type)
+    failures += [f"after a large removal: {failure}" for failure in compacted_failures]
+    return accuracy, build_seconds, update_seconds, failures
+
+def main():
+    args = parse_args()
+    matrix = np.random.default_rng(0).standard_normal((args.vectors, args.dimension)).astype(np.float32)
+
+    failed = False
+    for index_type in INDEX_TYPES:
+        accuracy, build_seconds, update_seconds, failures = check(index_type, matrix, args.document_chunks)
+        print(f"{index_type:<10} build {build_seconds:.2f}s, update {update_seconds * 1000:.1f}ms, "
+              f"{accuracy:.3f} of the live chunks found first: {'FAILED' if failures else 'ok'}")
+        for failure in failures[:5]:
+            print(f"    {failure}")
+        failed = failed or bool(failures)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# check_json_repair.py
+#
+# Checks extract_json on the model output defects it is meant to repair.
+#
+#   python benchmarks/check_json_repair.py
+#
+# Exits with status 1 when a case does not give the expected dict.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.json_extractor import extract_json
+
+CASES = [
+    ('{"name": "Maria"}', {"name": "Maria"}),
+    ('Here is the data: {"name": "Maria", "email": \'maria@email.com\',}', {"name": "Maria", "email": "maria@email.com"}),
+    ("{'a': 'it\\'s', 'b': True}", {"a": "it's", "b": True}),
+    ('{"a": "it\\\'s"}', {"a": "it's"}),
+    ("{'a': 'say \"hi\"', 'b': None}", {"a": 'say "hi"', "b": None}),
+    ('{"a": "x\\\\", "b": 1}', {"a": "x\\", "b": 1}),
+    ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+    ('{"issue": "Falta de médicos", "service": "Saúde"', {"issue": "Falta de médicos", "service": "Saúde"}),
+    ('{"a": [1, 2,', {"a": [1, 2]}),
+    ('{"a": "cut', {"a": "cut"}),
+    ('{"a": 1, "b":', {"a": 1, "b": None}),
+    ('{"a": "{not a brace}"} trailing {"b": 2}', {"a": "{not a brace}"}),
+    ("no json here", None),
+]
+
+def main():
+    failed = 0
+    for text, expected in CASES:
+        result = extract_json(text)
+        if result != expected:
+            failed += 1
+            print(f"FAILED {text!r}: {result!r} != {expected!r}")
+    print(f"{len(CASES) - failed}/{len(CASES)} cases ok")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
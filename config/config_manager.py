@@ -14,8 +14,59 @@ class Config:
         self.kafka_server = os.getenv("KAFKA_SERVER", "localhost:9092")
         self.consumer_topic = os.getenv("CONSUMER_TOPIC", "chat")
         self.producer_topic = os.getenv("PRODUCER_TOPIC", "answer")
+        self.consumer_group = os.getenv("CONSUMER_GROUP", "default_group")
+        # Topic receiving the records that fail to process; empty retries them instead of moving on
+        self.dead_letter_topic = os.getenv("KAFKA_DEAD_LETTER_TOPIC", f"{self.consumer_topic}-dead-letter") or None
+        # Attempts at a record that keeps failing before it is skipped, and the first retry delay in seconds
+        self.kafka_max_attempts = int(os.getenv("KAFKA_MAX_ATTEMPTS", "5"))
+        self.kafka_retry_backoff = float(os.getenv("KAFKA_RETRY_BACKOFF", "1"))
+        # Worker threads processing Kafka records, and how many records are pulled per poll
+        self.kafka_workers = int(os.getenv("KAFKA_WORKERS", "4"))
+        self.kafka_max_records = int(os.getenv("KAFKA_MAX_RECORDS", "16"))
+        # Producer batching: records are grouped for up to linger_ms before being sent
+        self.kafka_linger_ms = int(os.getenv("KAFKA_LINGER_MS", "5"))
+        self.kafka_batch_size = int(os.getenv("KAFKA_BATCH_SIZE", "16384"))
+        self.kafka_compression_type = os.getenv("KAFKA_COMPRESSION_TYPE") or None
         self.csv_file_path = os.getenv("CSV_FILE_PATH", "conversation_results.csv")
         self.tts_server = os.getenv("TTS_SERVER","http://localhost:8000")
+        # Directory where the FAISS index is saved between runs; empty disables the on-disk cache
+        self.vector_index_directory = os.getenv("VECTOR_INDEX_DIRECTORY", "vector_index") or None
+        # FAISS index type (flat, ivf_flat, ivf_pq, hnsw) and its search-time knobs
+        self.vector_index_type = os.getenv("VECTOR_INDEX_TYPE", "flat")
+        self.vector_nlist = int(os.getenv("VECTOR_NLIST", "0")) or None
+        self.vector_nprobe = int(os.getenv("VECTOR_NPROBE", "8"))
+        self.vector_ef_search = int(os.getenv("VECTOR_EF_SEARCH", "64"))
+        # LRU caches of query embeddings and of search results (0 disables the result cache)
+        self.query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self.result_cache_size = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+        # Seconds between two scans of the content directory in --watch-content mode
+        self.content_watch_interval = float(os.getenv("CONTENT_WATCH_INTERVAL", "10"))
+        # Audio pipeline: concurrent transcription requests, transcriptions queued for the LLM stage,
+        # and the size above which WAV files are streamed to the transcription server
+        self.audio_transcription_workers = int(os.getenv("AUDIO_TRANSCRIPTION_WORKERS", "4"))
+        self.audio_queue_size = int(os.getenv("AUDIO_QUEUE_SIZE", "8"))
+        self.audio_stream_threshold = int(os.getenv("AUDIO_STREAM_THRESHOLD", str(8 * 1024 * 1024)))
+        # Shared HTTP connection pool used for the inference and transcription servers
+        self.http_pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+        self.http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.http_read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+        self.http_retries = int(os.getenv("HTTP_RETRIES", "3"))
+        self.http_backoff_factor = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+        # Number of LLM chains (extraction, intent, summary, sentiment) run concurrently per conversation
+        self.llm_concurrency = int(os.getenv("LLM_CONCURRENCY", "1"))
+        # Minimum seconds between two partial summaries published in --stream-events mode
+        self.llm_stream_interval = float(os.getenv("LLM_STREAM_INTERVAL", "0.25"))
+        # On-disk cache of LLM responses; empty disables it. A TTL of 0 keeps responses forever
+        self.llm_cache_path = os.getenv("LLM_CACHE_PATH", "")
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "604800"))
+        # Results buffered by the local mode sink before it writes them, and written files between two
+        # checkpoint commits
+        self.result_batch_rows = int(os.getenv("RESULT_BATCH_ROWS", "256"))
+        self.checkpoint_interval = int(os.getenv("CHECKPOINT_INTERVAL", "16"))
+        # Local Prometheus /metrics endpoint (0 disables it) and JSON lines trace of every conversation
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))
+        self.metrics_trace_path = os.getenv("METRICS_TRACE_PATH", "")
 
     def __str__(self):
         """ String representation for easy debugging. """
@@ -23,7 +74,10 @@ class Config:
                 f"Kafka Server: {self.kafka_server}\n"
                 f"Consumer Topic: {self.consumer_topic}\n"
                 f"Producer Topic: {self.producer_topic}\n"
-                f"CSV File Path: {self.csv_file_path}")
+                f"Consumer Group: {self.consumer_group}\n"
+                f"Kafka Workers: {self.kafka_workers}\n"
+                f"CSV File Path: {self.csv_file_path}\n"
+                f"LLM Concurrency: {self.llm_concurrency}")
 
 # This allows the config instance to be available across the application.
 config = Config()
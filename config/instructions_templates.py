@@ -139,3 +139,44 @@ audio_extraction_template = """
         "detailed_description": ""
     }}
     """
+
+combined_extraction_template = """
+    >>INTRODUCTION<<
+    As an AI expert assistant, analyze the provided conversation and, in a single answer, extract its details, classify its intent, determine its sentiment and summarize it. Format everything into one structured JSON object following the guidelines below. Exclude any text that is not part of the JSON object.
+
+    >>DOMAIN<<
+    Conversation Transcript:
+    {conversation}
+
+    >>QUESTION<<
+    Construct a JSON object based on the conversation details. Include the following fields:
+    - **Name**: The full name(s) of the individual(s) involved.
+    - **Email**: The email address(es) cited.
+    - **Phone Number**: Any phone number(s) provided.
+    - **Location**: Details of any specific locations related to the issue or service.
+    - **Department**: The department or entity involved, if mentioned.
+    - **Issue**: A succinct description of the primary issue(s) discussed.
+    - **Service**: The specific service(s) referenced in relation to the issue.
+    - **Additional Information**: Other pertinent details or stakeholders mentioned.
+    - **Detailed Description**: An in-depth summary of the concern or request, including desired outcomes, if any.
+    - **Intent**: The single category that best describes the intent of the conversation, one of: Accusation, Booking, Information Request, General Commentary, Complaint, Compliment.
+    - **Sentiment**: The overall tone of the conversation, one of: Positive, Negative, Neutral.
+    - **Summary**: A tweet-like summary of the conversation, not exceeding 280 characters.
+
+    >>ANSWER<<
+    Ensure the output is a clean JSON object:
+    {{
+        "name": "",
+        "email": "",
+        "phone_number": "",
+        "location": "",
+        "department": "",
+        "issue": "",
+        "service": "",
+        "additional_information": "",
+        "detailed_description": "",
+        "intent": "",
+        "sentiment": "",
+        "summary": ""
+    }}
+    """
@@ -1,45 +1,123 @@
 # llm_config.py
-from langchain_community.llms import HuggingFaceTextGenInference
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+import threading
 from config.config_manager import config
-from config.instructions_templates import audio_extraction_template, extraction_template, intent_classification_template, summary_extraction_template, sentiment_extraction_template
+from utilities.metrics import metrics
+from config.instructions_templates import audio_extraction_template, combined_extraction_template, extraction_template, intent_classification_template, summary_extraction_template, sentiment_extraction_template
+
+# Prompt template and input variable of each template type
+TEMPLATES = {
+    'extraction': (extraction_template, "conversation"),
+    'intent_classification': (intent_classification_template, "conversation"),
+    'summary_classification': (summary_extraction_template, "conversation"),
+    'sentiment_classification': (sentiment_extraction_template, "conversation"),
+    'audio_extraction': (audio_extraction_template, "transcription"),
+    'combined': (combined_extraction_template, "conversation"),
+}
 
 class LLMConfig:
-    """ Encapsulates the AI model setup and interaction logic. """
+    """ Encapsulates the AI model setup and interaction logic.
+
+    The client and the chains are built on first use, so importing this module does not pull in LangChain.
+    """
 
     def __init__(self):
-        """ Initialize the AI model with necessary parameters from the config. """
-        self.llm = HuggingFaceTextGenInference(
-            inference_server_url=config.inference_server_url,
-            max_new_tokens=512,
-            top_k=10,
-            top_p=0.95,
-            typical_p=0.95,
-            temperature=0.1,
-            repetition_penalty=1.175
-        )
-        # Initialize chains for each template
-        self.extraction_chain = LLMChain(prompt=PromptTemplate.from_template(extraction_template), llm=self.llm)
-        self.intent_classification_chain = LLMChain(prompt=PromptTemplate.from_template(intent_classification_template), llm=self.llm)
-        self.summary_classification_chain = LLMChain(prompt=PromptTemplate.from_template(summary_extraction_template), llm=self.llm)
-        self.sentiment_classification_chain = LLMChain(prompt=PromptTemplate.from_template(sentiment_extraction_template), llm=self.llm)
-        self.audio_extraction_chain = LLMChain(prompt=PromptTemplate.from_template(audio_extraction_template), llm=self.llm)
+        """ Initialize the AI model parameters from the config. """
+        self.inference_server_url = config.inference_server_url
+        self.generation_params = {
+            "max_new_tokens": 512,
+            "top_k": 10,
+            "top_p": 0.95,
+            "typical_p": 0.95,
+            "temperature": 0.1,
+            "repetition_penalty": 1.175
+        }
+        self.cache = None
+        self._llm = None
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    def enable_cache(self, path, max_entries=10000, ttl_seconds=None):
+        """ Put an on-disk response cache in front of invoke. """
+        from llms.response_cache import LLMResponseCache
+        self.cache = LLMResponseCache(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.cache.purge_expired()
+        return self.cache
+
+    @property
+    def llm(self):
+        """ The text generation client, created on first access. """
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    from langchain_community.llms import HuggingFaceTextGenInference
+                    from llms.tgi_client import PooledTextGenerationClient
+                    llm = HuggingFaceTextGenInference(
+                        inference_server_url=self.inference_server_url,
+                        **self.generation_params
+                    )
+                    # Send the requests through the shared keep-alive session, with timeouts and retries
+                    llm.client = PooledTextGenerationClient(self.inference_server_url)
+                    self._llm = llm
+        return self._llm
+
+    def get_chain(self, template_type):
+        """ Return the LLMChain and the name of its input variable for the specified template type. """
+        if template_type not in TEMPLATES:
+            raise ValueError("Invalid template type specified")
+
+        template, input_key = TEMPLATES[template_type]
+        chain = self._chains.get(template_type)
+        if chain is None:
+            llm = self.llm
+            with self._lock:
+                chain = self._chains.get(template_type)
+                if chain is None:
+                    from langchain.chains import LLMChain
+                    from langchain.prompts import PromptTemplate
+                    chain = LLMChain(prompt=PromptTemplate.from_template(template), llm=llm)
+                    self._chains[template_type] = chain
+        return chain, input_key
+
+    def cache_key(self, chain, template_type, inputs):
+        """ Key of a request in the response cache: template type, rendered prompt and generation parameters. """
+        return self.cache.make_key(template_type, chain.prompt.format(**inputs), self.generation_params)
 
     def invoke(self, conversation, template_type='extraction'):
         """ Invoke the LLMChain with a given conversation to process text based on the specified template type. """
-        if template_type == 'extraction':
-            return self.extraction_chain.invoke({"conversation": conversation})
-        elif template_type == 'intent_classification':
-            return self.intent_classification_chain.invoke({"conversation": conversation})
-        elif template_type == 'summary_classification':
-            return self.summary_classification_chain.invoke({"conversation": conversation})
-        elif template_type == 'sentiment_classification':
-            return self.sentiment_classification_chain.invoke({"conversation": conversation})
-        elif template_type == 'audio_extraction':
-            return self.audio_extraction_chain.invoke({"transcription": conversation})
-        else:
-            raise ValueError("Invalid template type specified")
+        chain, input_key = self.get_chain(template_type)
+        inputs = {input_key: conversation}
+        with metrics.timer("llm_invoke", template=template_type):
+            if self.cache is None:
+                return chain.invoke(inputs)
+
+            key = self.cache_key(chain, template_type, inputs)
+            response = self.cache.get(key)
+            if response is None:
+                response = chain.invoke(inputs)
+                self.cache.put(key, template_type, response)
+            return response
+
+    def stream(self, conversation, template_type='summary_classification'):
+        """ Yield the response of a template type as it is generated, token by token.
+
+        The full response is cached like invoke's; a cached response is yielded in one piece.
+        """
+        chain, input_key = self.get_chain(template_type)
+        inputs = {input_key: conversation}
+        key = self.cache_key(chain, template_type, inputs) if self.cache is not None else None
+        if key is not None:
+            response = self.cache.get(key)
+            if response is not None:
+                yield response.get('text', '')
+                return
+
+        tokens = []
+        with metrics.timer("llm_stream", template=template_type):
+            for token in self.llm.client.generate_stream(chain.prompt.format(**inputs), **self.generation_params):
+                tokens.append(token)
+                yield token
+        if key is not None:
+            self.cache.put(key, template_type, {**inputs, 'text': ''.join(tokens)})
 
 # The LLMConfig instance can be reused across different parts of the application.
 llm_config = LLMConfig()
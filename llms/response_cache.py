@@ -0,0 +1,96 @@
+# response_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+class LLMResponseCache:
+    """ On-disk SQLite cache of LLM responses.
+
+    Entries are keyed by the template type, a hash of the rendered prompt and the generation parameters,
+    so reprocessing or replaying the same conversations does not hit the inference server again.
+    Entries older than ttl_seconds are ignored and the least recently used ones are evicted beyond max_entries.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl_seconds=None):
+        """
+        Parameters:
+            path (str): SQLite database file.
+            max_entries (int): Maximum number of responses kept.
+            ttl_seconds (float, optional): Age after which a response is stale. None keeps responses forever.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._connection:
+            # WAL lets several worker processes share the same cache file
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, template_type TEXT, response TEXT, created_at REAL, last_access REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    @staticmethod
+    def make_key(template_type, prompt, generation_params):
+        """ Build the cache key of a rendered prompt. """
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        payload = json.dumps([template_type, prompt_hash, generation_params], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Return the cached response for key, or None on a miss or a stale entry. """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    with self._connection:
+                        self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, template_type, response):
+        """ Store a response, evicting the least recently used entries beyond max_entries. """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, template_type, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, template_type, json.dumps(response), now, now)
+            )
+            excess = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def purge_expired(self):
+        """ Delete every stale entry and return how many were removed. """
+        if not self.ttl_seconds:
+            return 0
+        with self._lock, self._connection:
+            removed = self._connection.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        """ Hit, miss and eviction counters plus the current number of entries. """
+        with self._lock:
+            size = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"size": size, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
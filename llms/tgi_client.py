@@ -0,0 +1,50 @@
+# tgi_client.py
+import json
+from types import SimpleNamespace
+from utilities.http_client import http_request
+
+class PooledTextGenerationClient:
+    """ Minimal text-generation-inference client sending requests through the shared, pooled HTTP session.
+
+    It replaces the client HuggingFaceTextGenInference builds, which opens a new connection for every request.
+    generate is what the LLM calls with the invocation parameters; generate_stream yields the tokens as TGI produces them.
+    """
+
+    def __init__(self, base_url, timeout=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    @staticmethod
+    def build_parameters(parameters):
+        """ Translate LangChain's invocation parameters into the TGI request parameters. """
+        parameters = {key: value for key, value in parameters.items() if value is not None}
+        stop_sequences = parameters.pop("stop_sequences", None)
+        if stop_sequences:
+            parameters["stop"] = stop_sequences
+        return parameters
+
+    def generate(self, prompt, **parameters):
+        response = http_request(
+            "POST", f"{self.base_url}/generate", endpoint="tgi.generate", timeout=self.timeout,
+            json={"inputs": prompt, "parameters": self.build_parameters(parameters)}
+        )
+        response.raise_for_status()
+        return SimpleNamespace(generated_text=response.json()["generated_text"])
+
+    def generate_stream(self, prompt, **parameters):
+        """ Yield the text of each generated token from TGI's server-sent events, skipping special tokens. """
+        response = http_request(
+            "POST", f"{self.base_url}/generate_stream", endpoint="tgi.generate_stream", timeout=self.timeout,
+            json={"inputs": prompt, "parameters": self.build_parameters(parameters)}, stream=True
+        )
+        response.raise_for_status()
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                if "error" in event:
+                    raise RuntimeError(f"Text generation failed: {event['error']}")
+                token = event.get("token") or {}
+                if not token.get("special"):
+                    yield token.get("text", "")
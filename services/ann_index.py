@@ -0,0 +1,239 @@
+# ann_index.py
+
+import math
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def needs_training(index_type):
+    """IVF variants learn their coarse (and PQ) centroids from a sample of the vectors."""
+    return index_type in ("ivf_flat", "ivf_pq")
+
+def default_nlist(num_vectors):
+    """Number of IVF lists: about 4 * sqrt(n), keeping at least 39 training points per list."""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+def factory_string(index_type, num_vectors, nlist=None, pq_m=48, hnsw_m=32):
+    """Returns the faiss.index_factory description of an index type."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist or default_nlist(num_vectors)},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist or default_nlist(num_vectors)},PQ{pq_m}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    raise ValueError(f"Invalid index type specified: {index_type}. Choose one of {', '.join(INDEX_TYPES)}")
+
+def build_faiss_index(index_type, dimension, training_vectors, nlist=None, pq_m=48, hnsw_m=32):
+    """Creates an empty FAISS index of the given type, trained on training_vectors when needed.
+
+    When there are too few vectors to train an IVF index (PQ needs 256 points per codebook), a flat
+    index is returned instead.
+    """
+    faiss = dependable_faiss_import()
+    training_vectors = np.asarray(training_vectors, dtype=np.float32)
+    num_vectors = len(training_vectors)
+
+    if needs_training(index_type):
+        lists = nlist or default_nlist(num_vectors)
+        required = max(lists * 39, 256 if index_type == "ivf_pq" else 0)
+        if num_vectors < required:
+            print(f"{num_vectors} vectors are too few to train a {index_type} index ({required} needed), using a flat index.")
+            index_type = "flat"
+
+    index = faiss.index_factory(dimension, factory_string(index_type, num_vectors, nlist, pq_m, hnsw_m))
+    if not index.is_trained:
+        index.train(training_vectors)
+    return index
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Applies the search-time knobs of IVF (nprobe) and HNSW (efSearch) indexes; flat indexes ignore them."""
+    faiss = dependable_faiss_import()
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+def create_vector_store(embeddings, index):
+    """Wraps a FAISS index in an empty StableIdFAISS vector store."""
+    return StableIdFAISS(embedding_function=embeddings, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+
+def is_hnsw(index):
+    return hasattr(index, "hnsw")
+
+def is_ivf(index):
+    faiss = dependable_faiss_import()
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+def ivf_labels(index):
+    """Returns the labels stored in the inverted lists of an IVF index."""
+    faiss = dependable_faiss_import()
+    ivf = faiss.extract_index_ivf(index)
+    labels = []
+    for list_no in range(ivf.nlist):
+        size = ivf.invlists.list_size(list_no)
+        if size:
+            labels.append(faiss.rev_swig_ptr(ivf.invlists.get_ids(list_no), size).copy())
+    return np.sort(np.concatenate(labels)) if labels else np.empty(0, dtype=np.int64)
+
+def stored_vectors(index):
+    """Returns every vector of an index, in label order. IVF labels may have gaps after removals."""
+    faiss = dependable_faiss_import()
+    if not is_ivf(index):
+        return index.reconstruct_n(0, index.ntotal)
+    faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+    labels = ivf_labels(index)
+    if not len(labels):
+        return np.empty((0, index.d), dtype=np.float32)
+    return np.vstack([index.reconstruct(int(label)) for label in labels])
+
+class StableIdFAISS(FAISS):
+    """LangChain FAISS store whose index labels do not change when chunks are removed.
+
+    LangChain's delete renumbers the remaining vectors to 0..n-1, which only matches a flat index.
+    IVF indexes here add vectors with explicit labels and drop them with remove_ids, keeping their
+    trained centroids, so an update never retrains or re-quantizes. An HNSW graph cannot remove
+    vectors: removed labels become tombstones that searches skip, and the graph is rebuilt without
+    them once they exceed compact_ratio of it. Flat indexes keep LangChain's behaviour.
+    """
+
+    compact_ratio = 0.2
+    # Selector skipping the HNSW tombstones, rebuilt after every change
+    _tombstones = None
+
+    def _FAISS__add(self, texts, embeddings, metadatas=None, ids=None):
+        # Overrides the name-mangled FAISS.__add, which every add_* and from_* method goes through
+        if not (is_hnsw(self.index) or is_ivf(self.index)):
+            return super()._FAISS__add(texts, embeddings, metadatas=metadatas, ids=ids)
+
+        faiss = dependable_faiss_import()
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = np.array(embeddings, dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+
+        if is_hnsw(self.index):
+            # HNSW labels are insertion positions, tombstones included
+            labels = np.arange(self.index.ntotal, self.index.ntotal + len(texts), dtype=np.int64)
+            self.index.add(vectors)
+        else:
+            first = max(self.index_to_docstore_id, default=-1) + 1
+            labels = np.arange(first, first + len(texts), dtype=np.int64)
+            self.index.add_with_ids(vectors, labels)
+
+        self.docstore.add({doc_id: Document(page_content=text, metadata=metadata) for doc_id, text, metadata in zip(ids, texts, metadatas)})
+        self.index_to_docstore_id.update(zip(labels.tolist(), ids))
+        self._tombstones = None
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        """Removes the chunks with the given docstore ids without renumbering the others."""
+        if not (is_hnsw(self.index) or is_ivf(self.index)):
+            return super().delete(ids, **kwargs)
+        if ids is None:
+            raise ValueError("No ids provided to delete.")
+
+        removed = set(ids)
+        labels = [label for label, doc_id in self.index_to_docstore_id.items() if doc_id in removed]
+        if len(labels) != len(removed):
+            found = {self.index_to_docstore_id[label] for label in labels}
+            raise ValueError(f"Some specified ids do not exist in the current store. Ids not found: {removed - found}")
+
+        if not is_hnsw(self.index):
+            self.index.remove_ids(np.array(labels, dtype=np.int64))
+        for label in labels:
+            del self.index_to_docstore_id[label]
+        self.docstore.delete(list(removed))
+        self._tombstones = None
+
+        if is_hnsw(self.index) and self.index.ntotal - len(self.index_to_docstore_id) > self.compact_ratio * self.index.ntotal:
+            self.compact()
+        return True
+
+    def vectors_of(self, doc_ids):
+        """Returns the stored vectors of the given docstore ids that are still indexed, as {doc_id: vector}.
+
+        IVF indexes get a hashtable direct map on first use; add_with_ids and remove_ids keep it up to date.
+        """
+        faiss = dependable_faiss_import()
+        wanted = set(doc_ids)
+        labels = {doc_id: label for label, doc_id in self.index_to_docstore_id.items() if doc_id in wanted}
+        if labels and is_ivf(self.index):
+            ivf = faiss.extract_index_ivf(self.index)
+            if ivf.direct_map.type != faiss.DirectMap.Hashtable:
+                ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return {doc_id: self.index.reconstruct(int(label)) for doc_id, label in labels.items()}
+
+    def compact(self):
+        """Rebuilds an HNSW graph without its tombstones; the labels become 0..n-1 again."""
+        faiss = dependable_faiss_import()
+        labels = sorted(self.index_to_docstore_id)
+        graph = self.index
+        index = faiss.IndexHNSWFlat(graph.d, graph.hnsw.nb_neighbors(1), graph.metric_type)
+        index.hnsw.efConstruction = graph.hnsw.efConstruction
+        index.hnsw.efSearch = graph.hnsw.efSearch
+        if labels:
+            index.add(graph.reconstruct_n(0, graph.ntotal)[labels])
+        self.index = index
+        self.index_to_docstore_id = {position: self.index_to_docstore_id[label] for position, label in enumerate(labels)}
+        self._tombstones = None
+
+    def search_labels(self, vectors, k):
+        """Searches the index like index.search, skipping the tombstones of an HNSW graph.
+
+        Returns:
+            tuple: (distances, labels) arrays; a label of -1 marks a missing result.
+        """
+        if not is_hnsw(self.index) or self.index.ntotal == len(self.index_to_docstore_id):
+            return self.index.search(vectors, k)
+
+        faiss = dependable_faiss_import()
+        if self._tombstones is None:
+            tombstones = np.setdiff1d(np.arange(self.index.ntotal, dtype=np.int64), np.fromiter(self.index_to_docstore_id, dtype=np.int64))
+            batch = faiss.IDSelectorBatch(tombstones)
+            # The batch selector is kept alongside, since the Not selector does not own it
+            self._tombstones = (batch, faiss.IDSelectorNot(batch))
+        params = faiss.SearchParametersHNSW(sel=self._tombstones[1], efSearch=self.index.hnsw.efSearch)
+        return self.index.search(vectors, k, params=params)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        """FAISS.similarity_search_with_score_by_vector, searching with search_labels."""
+        if not is_hnsw(self.index) or self.index.ntotal == len(self.index_to_docstore_id):
+            return super().similarity_search_with_score_by_vector(embedding, k, filter=filter, fetch_k=fetch_k, **kwargs)
+
+        faiss = dependable_faiss_import()
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        scores, labels = self.search_labels(vector, k if filter is None else fetch_k)
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+
+        docs = []
+        for score, label in zip(scores[0], labels[0]):
+            if label == -1:
+                continue
+            doc = self.docstore.search(self.index_to_docstore_id[label])
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, score))
+
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            higher_is_better = self.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+            docs = [(doc, score) for doc, score in docs if (score >= score_threshold if higher_is_better else score <= score_threshold)]
+        return docs[:k]
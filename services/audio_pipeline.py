@@ -0,0 +1,114 @@
+# audio_pipeline.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()
+
+class StageStats:
+    """Counts the items handled by a pipeline stage and the time spent on them."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            now = time.perf_counter()
+            self.started = self.started if self.started is not None else now - seconds
+            self.finished = now
+            self.busy_seconds += seconds
+            if ok:
+                self.count += 1
+            else:
+                self.errors += 1
+
+    def throughput(self):
+        """Items completed per second of wall time while the stage was active."""
+        if self.started is None or self.finished <= self.started:
+            return 0.0
+        return self.count / (self.finished - self.started)
+
+    def summary(self):
+        return (f"{self.name}: {self.count} files, {self.errors} errors, {self.throughput():.2f} files/sec, "
+                f"{self.busy_seconds:.1f}s busy")
+
+class AudioPipeline:
+    """Transcribes audio files and runs the LLM stage on them as two overlapping stages.
+
+    A bounded pool sends concurrent transcription requests and pushes each transcription into a bounded
+    queue consumed by the LLM workers, so the transcription of file N+1 runs while the LLMs process
+    file N. When the LLM stage falls behind, the full queue blocks the transcription workers.
+    """
+
+    def __init__(self, transcribe, process, transcription_workers=4, llm_workers=1, queue_size=8):
+        """
+        Parameters:
+            transcribe (callable): Receives a file path and returns its transcription.
+            process (callable): Receives a file path and its transcription; runs the LLM stage.
+            transcription_workers (int): Concurrent transcription requests.
+            llm_workers (int): Transcriptions processed by the LLM stage at the same time.
+            queue_size (int): Transcriptions waiting for the LLM stage before transcription pauses.
+        """
+        self.transcribe = transcribe
+        self.process = process
+        self.transcription_workers = max(1, transcription_workers)
+        self.llm_workers = max(1, llm_workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.transcription_stats = StageStats("transcription")
+        self.llm_stats = StageStats("llm")
+
+    def run(self, file_paths):
+        """Processes every file and returns the stage statistics once both stages are drained."""
+        consumers = [
+            threading.Thread(target=self.consume, name=f"audio-llm-{i}", daemon=True)
+            for i in range(self.llm_workers)
+        ]
+        for consumer in consumers:
+            consumer.start()
+
+        with ThreadPoolExecutor(max_workers=self.transcription_workers, thread_name_prefix="audio-stt") as executor:
+            for file_path in file_paths:
+                executor.submit(self.transcribe_file, file_path)
+
+        for _ in consumers:
+            self.queue.put(_END)
+        for consumer in consumers:
+            consumer.join()
+
+        for stats in (self.transcription_stats, self.llm_stats):
+            logging.info(stats.summary())
+        return self.transcription_stats, self.llm_stats
+
+    def transcribe_file(self, file_path):
+        start = time.perf_counter()
+        try:
+            transcription = self.transcribe(file_path)
+        except Exception as e:
+            self.transcription_stats.record(time.perf_counter() - start, ok=False)
+            logging.error(f"Failed to transcribe audio file {file_path}: {e}")
+            return
+        self.transcription_stats.record(time.perf_counter() - start)
+        self.queue.put((file_path, transcription))
+
+    def consume(self):
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                return
+            file_path, transcription = item
+            start = time.perf_counter()
+            try:
+                self.process(file_path, transcription)
+                self.llm_stats.record(time.perf_counter() - start)
+            except Exception as e:
+                self.llm_stats.record(time.perf_counter() - start, ok=False)
+                logging.error(f"Failed to process audio file {file_path}: {e}")
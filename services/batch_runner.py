@@ -0,0 +1,176 @@
+# batch_runner.py
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list, e.g. fraction=0.95 for p95."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Checkpoint:
+    """Append-only JSON lines manifest of the files a batch run has finished.
+
+    Each line records the path, modification time and size of a file, so a restarted run skips the
+    files done since and processes again the ones that changed. The runner only marks a file once the
+    sink has written its result: a file is never recorded as done before its result is on disk, at
+    worst it is processed twice after a crash.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self.pending = []
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash
+                    self.done[entry["path"]] = (entry["mtime"], entry["size"])
+
+    @staticmethod
+    def signature(file_path):
+        stat = os.stat(file_path)
+        return stat.st_mtime, stat.st_size
+
+    def is_done(self, file_path):
+        recorded = self.done.get(file_path)
+        return recorded is not None and tuple(recorded) == self.signature(file_path)
+
+    def mark(self, file_path):
+        mtime, size = self.signature(file_path)
+        with self._lock:
+            self.pending.append({"path": file_path, "mtime": mtime, "size": size})
+
+    def commit(self):
+        with self._lock:
+            entries, self.pending = self.pending, []
+        if not entries:
+            return
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        for entry in entries:
+            self.done[entry["path"]] = (entry["mtime"], entry["size"])
+
+class BatchStats:
+    """Files processed, skipped and failed by a batch run, with the per-file latencies."""
+
+    def __init__(self):
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.latencies = []
+        self.elapsed = 0.0
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        files_per_second = self.processed / self.elapsed if self.elapsed else 0.0
+        return (f"batch: {self.processed} files, {self.skipped} skipped, {self.failed} errors, "
+                f"{files_per_second:.2f} files/sec, p50 {percentile(latencies, 0.5):.2f}s, "
+                f"p95 {percentile(latencies, 0.95):.2f}s per file")
+
+class BatchRunner:
+    """Processes files concurrently and appends each result to a sink as soon as it is ready.
+
+    The work is made of HTTP calls to the LLM, embedding and transcription servers, so the files run on a
+    thread pool; at most twice the worker count are in flight, so the result of a large directory is
+    never held in memory. The sink writes the results in its own batches; the files whose results it
+    has written are committed to the checkpoint every checkpoint_every files and at the end.
+    """
+
+    def __init__(self, process_file, sink=None, checkpoint=None, workers=4, checkpoint_every=16):
+        """
+        Parameters:
+            process_file (callable): Receives a file path and returns its result dict, or None to skip it.
+            sink (optional): Sink receiving the results (see services/result_sink.py), whose write()
+                and flush() return the results they wrote; None only logs them.
+            checkpoint (Checkpoint, optional): Manifest of finished files; None processes every file.
+            workers (int): Files processed at the same time.
+            checkpoint_every (int): Finished files between two checkpoint commits.
+        """
+        self.process_file = process_file
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.workers = max(1, workers)
+        self.checkpoint_every = max(1, checkpoint_every)
+
+    def timed_process(self, file_path):
+        start = time.perf_counter()
+        result = self.process_file(file_path)
+        return result, time.perf_counter() - start
+
+    def run(self, file_paths):
+        """Processes every file not yet in the checkpoint and returns the BatchStats of the run."""
+        stats = BatchStats()
+        todo = []
+        for file_path in file_paths:
+            if self.checkpoint is not None and self.checkpoint.is_done(file_path):
+                stats.skipped += 1
+            else:
+                todo.append(file_path)
+        if stats.skipped:
+            logging.info(f"Skipping {stats.skipped} files already in the checkpoint {self.checkpoint.path}")
+
+        start = time.perf_counter()
+        uncommitted = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+            in_flight = {}
+            remaining = iter(todo)
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    file_path = next(remaining, None)
+                    if file_path is None:
+                        break
+                    in_flight[executor.submit(self.timed_process, file_path)] = file_path
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = in_flight.pop(future)
+                    try:
+                        result, seconds = future.result()
+                        if result is not None and self.sink is not None:
+                            done = [written["file_path"] for written in self.sink.write({"file_path": file_path, **result})]
+                        else:
+                            done = [file_path]
+                    except Exception as e:
+                        stats.failed += 1
+                        logging.error(f"Failed to process file {file_path}: {e}")
+                        continue
+                    stats.processed += 1
+                    stats.latencies.append(seconds)
+                    uncommitted += self.mark(done)
+                    if uncommitted >= self.checkpoint_every:
+                        self.commit()
+                        uncommitted = 0
+        if self.sink is not None:
+            self.mark([written["file_path"] for written in self.sink.flush()])
+        self.commit()
+        stats.elapsed = time.perf_counter() - start
+        logging.info(stats.summary())
+        return stats
+
+    def mark(self, file_paths):
+        """Records files whose results are on disk; returns how many."""
+        if self.checkpoint is not None:
+            for file_path in file_paths:
+                self.checkpoint.mark(file_path)
+        return len(file_paths)
+
+    def commit(self):
+        if self.checkpoint is not None:
+            self.checkpoint.commit()
+
+# Example usage:
+# runner = BatchRunner(process_file, open_sink("results.jsonl"), Checkpoint("results.jsonl.checkpoint.jsonl"), workers=8)
+# runner.run(["data/conversations/1.txt", "data/conversations/2.txt"])
@@ -0,0 +1,44 @@
+# content_watcher.py
+
+import logging
+import threading
+
+class ContentWatcher:
+    """Keeps a VectorDatabaseManager in sync with its content directory while the application runs.
+
+    The directory is polled every interval seconds. Each poll only stats the files; the ones that were
+    added, modified or removed are re-embedded or dropped through VectorDatabaseManager.sync.
+    """
+
+    def __init__(self, vector_db_manager, interval=10.0):
+        """
+        Parameters:
+            vector_db_manager (VectorDatabaseManager): An initialized manager.
+            interval (float): Seconds between two polls of the content directory.
+        """
+        self.vector_db_manager = vector_db_manager
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts polling in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="content-watcher", daemon=True)
+            self._thread.start()
+            logging.info(f"Watching {self.vector_db_manager.content_directory} every {self.interval}s")
+        return self
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.vector_db_manager.sync()
+            except Exception as e:
+                logging.error(f"Failed to sync the vector index: {e}")
+
+    def stop(self):
+        """Stops polling and waits for the current sync to finish."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -23,6 +23,88 @@ def save_to_csv(file_path, data_dict, headers=None):
 
         writer.writerow(data_dict)
 
+class CsvWriter:
+    """Appends rows to a CSV file through one open handle, writing them in batches.
+
+    save_to_csv opens the file and builds a writer for every row; archives of many rows go through
+    this writer instead. Rows are buffered and written every buffer_rows rows, on flush() and on close().
+    """
+
+    def __init__(self, file_path, headers, buffer_rows=1000):
+        """
+        Parameters:
+            file_path (str): Path to the CSV file; rows are appended when it already exists.
+            headers (list): Columns of the file, written first when the file is new or empty.
+            buffer_rows (int): Rows kept in memory before they are written.
+        """
+        self.file_path = file_path
+        self.buffer_rows = max(1, buffer_rows)
+        self._buffer = []
+        is_new = not os.path.isfile(file_path) or os.path.getsize(file_path) == 0
+        self._file = open(file_path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=headers)
+        if is_new:
+            self._writer.writeheader()
+
+    def write(self, data_dict):
+        """Buffers a row, writing the buffer once it holds buffer_rows rows.
+
+        Returns:
+            int: Number of rows written to the file by this call, 0 while they are buffered.
+        """
+        self._buffer.append(data_dict)
+        if len(self._buffer) >= self.buffer_rows:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Writes the buffered rows and flushes them to the operating system.
+
+        Returns:
+            int: Number of rows written.
+        """
+        written = len(self._buffer)
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self._buffer = []
+        self._file.flush()
+        return written
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def iter_csv(file_path):
+    """Yields the rows of a CSV file one at a time as dictionaries, without loading the file.
+
+    Parameters:
+        file_path (str): Path to the CSV file to read from.
+    """
+    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+        yield from csv.DictReader(csvfile)
+
+def iter_csv_batches(file_path, batch_size=10000):
+    """Yields the rows of a CSV file in lists of at most batch_size dictionaries."""
+    yield from batched(iter_csv(file_path), batch_size)
+
+def batched(rows, batch_size):
+    """Groups an iterable of rows into lists of at most batch_size rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def read_from_csv(file_path):
     """Reads rows from a CSV file and returns them as a list of dictionaries.
 
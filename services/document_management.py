@@ -1,6 +1,4 @@
 # document_management.py
-import json
-from services.vector_service import VectorDatabaseManager
 
 class DocumentManager:
     def __init__(self, vector_db_manager):
@@ -12,20 +10,35 @@ class DocumentManager:
         """
         self.vector_db_manager = vector_db_manager
 
-    def retrieve_documents(self, query):
+    def retrieve_documents(self, query, as_dataframe=False):
         """
         Retrieves documents related to a given query from the vector database.
 
         Parameters:
             query (str): The search query to retrieve relevant documents.
+            as_dataframe (bool): Return a pandas DataFrame instead of plain records, e.g. in a notebook.
 
         Returns:
-            list: A list of documents that are relevant to the query.
+            list: A list of documents that are relevant to the query, as dictionaries.
         """
         print(f"Querying the vector database for information on: {query}")
-        documents = self.vector_db_manager.retrieve_documents(query)
+        documents = self.vector_db_manager.retrieve_documents(query, as_dataframe=as_dataframe)
         return documents
 
+    def retrieve_related_documents(self, queries, as_dataframe=False):
+        """
+        Retrieves the documents related to several queries at once with hybrid (BM25 and vector) search.
+
+        Parameters:
+            queries (list): Keywords and free-text queries, e.g. the top words and the extracted issue.
+            as_dataframe (bool): Return a pandas DataFrame instead of plain records.
+
+        Returns:
+            list: The best documents over all the queries, as dictionaries.
+        """
+        print(f"Querying the vector database for information on: {queries}")
+        return self.vector_db_manager.retrieve_hybrid(queries, as_dataframe=as_dataframe)
+
     def index_new_document(self, document_path):
         """
         Indexes a new document into the vector database.
@@ -36,9 +49,8 @@ class DocumentManager:
         Returns:
             bool: True if the indexing was successful, False otherwise.
         """
-        # Example function body, this should be implemented based on your specific requirements
         try:
-            # Assuming 'vector_db_manager' has a method to add documents to the index
+            # Replaces the chunks of a previous version of the file, if any
             self.vector_db_manager.add_document_to_index(document_path)
             print(f"Successfully indexed: {document_path}")
             return True
@@ -46,6 +58,20 @@ class DocumentManager:
             print(f"Failed to index document {document_path}: {e}")
             return False
 
+    def remove_document(self, document_path):
+        """
+        Removes every chunk of a document from the vector database.
+
+        Parameters:
+            document_path (str): The file path of the document to remove.
+
+        Returns:
+            bool: True if the document had chunks in the index, False otherwise.
+        """
+        removed = self.vector_db_manager.remove_document_from_index(document_path)
+        print(f"Removed {removed} chunks of: {document_path}")
+        return removed > 0
+
 # Example usage:
 # Assuming you have an instance of VectorDatabaseManager already created and initialized
 # vector_db_manager = VectorDatabaseManager()
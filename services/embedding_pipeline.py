@@ -0,0 +1,153 @@
+# embedding_pipeline.py
+
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from langchain_community.document_loaders import UnstructuredMarkdownLoader
+from langchain.text_splitter import MarkdownTextSplitter
+from services.ann_index import needs_training
+
+def load_and_split(file_path, chunk_size, chunk_overlap):
+    """Loads one markdown file and splits it into chunks. Runs in the worker processes."""
+    documents = UnstructuredMarkdownLoader(file_path).load()
+    splitter = MarkdownTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_documents(documents)
+
+class EmbeddingPipeline:
+    """Streams a large markdown corpus into a VectorDatabaseManager's FAISS index.
+
+    Files are loaded and split in a process pool, at most max_pending_files at a time, and the chunks are
+    embedded and added to the index batch by batch. Only the pending files and one batch of chunks are held
+    in memory, whatever the size of the corpus; IVF indexes additionally hold back up to train_size vectors
+    until they are trained.
+    """
+
+    def __init__(self, vector_db_manager, batch_size=256, load_workers=None, multi_process=False, max_pending_files=None):
+        """
+        Parameters:
+            vector_db_manager (VectorDatabaseManager): Manager whose index receives the vectors.
+            batch_size (int): Number of chunks embedded and added to the index at once.
+            load_workers (int, optional): Processes loading and splitting files. Defaults to the CPU count.
+            multi_process (bool): Encode with sentence-transformers' multi-process pool across CPU cores.
+            max_pending_files (int, optional): Files loaded ahead of the embedding stage. Defaults to 4 per worker.
+        """
+        self.vector_db_manager = vector_db_manager
+        self.batch_size = max(1, batch_size)
+        self.load_workers = load_workers or os.cpu_count() or 1
+        self.multi_process = multi_process
+        self.max_pending_files = max_pending_files or self.load_workers * 4
+        self.chunks_indexed = 0
+        self.elapsed = 0.0
+        # Batches held back until there are enough vectors to train an IVF index
+        self.pending_training = []
+
+    def run(self, file_paths):
+        """Indexes every file and returns the docstore ids of the chunks of each file."""
+        ids_by_source = {path: [] for path in file_paths}
+        manager = self.vector_db_manager
+        encoder = MultiProcessEncoder(manager.get_embeddings()) if self.multi_process else None
+        start = time.perf_counter()
+        batch = []
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.load_workers) as executor:
+                pending = deque()
+                for path in file_paths:
+                    pending.append((path, executor.submit(load_and_split, path, manager.chunk_size, manager.chunk_overlap)))
+                    if len(pending) < self.max_pending_files:
+                        continue
+                    batch = self.collect(pending.popleft(), batch, ids_by_source, encoder, start)
+                while pending:
+                    batch = self.collect(pending.popleft(), batch, ids_by_source, encoder, start)
+            if batch:
+                self.add_batch(batch, ids_by_source, encoder)
+            if self.pending_training:
+                self.train_and_add(ids_by_source)
+        finally:
+            if encoder is not None:
+                encoder.close()
+
+        manager.result_cache.clear()
+        self.elapsed = time.perf_counter() - start
+        print(f"Indexed {self.chunks_indexed} chunks from {len(file_paths)} files in {self.elapsed:.1f}s ({self.chunks_per_second():.1f} chunks/sec)")
+        return ids_by_source
+
+    def collect(self, pending_file, batch, ids_by_source, encoder, start):
+        """Waits for one loaded file and flushes full batches of its chunks to the index."""
+        path, future = pending_file
+        try:
+            batch.extend(future.result())
+        except Exception as e:
+            print(f"Failed to load markdown file {path}: {e}")
+
+        while len(batch) >= self.batch_size:
+            self.add_batch(batch[:self.batch_size], ids_by_source, encoder)
+            batch = batch[self.batch_size:]
+            rate = self.chunks_indexed / max(time.perf_counter() - start, 1e-9)
+            print(f"Indexed {self.chunks_indexed} chunks ({rate:.1f} chunks/sec)")
+        return batch
+
+    def add_batch(self, chunks, ids_by_source, encoder):
+        """Embeds a batch of chunks and adds the vectors to the index."""
+        manager = self.vector_db_manager
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        ids = [str(uuid.uuid4()) for _ in chunks]
+
+        if encoder is not None:
+            vectors = encoder.encode(texts, self.batch_size)
+        else:
+            vectors = manager.get_embeddings().embed_documents(texts)
+
+        if manager.index is None and needs_training(manager.index_type):
+            # IVF indexes are trained on a sample before the first vector is added
+            self.pending_training.append((texts, vectors, metadatas, ids))
+            if sum(len(pending[0]) for pending in self.pending_training) >= manager.train_size:
+                self.train_and_add(ids_by_source)
+            return
+
+        self.add_embeddings(texts, vectors, metadatas, ids, ids_by_source)
+
+    def train_and_add(self, ids_by_source):
+        """Trains the index on the held-back batches, then adds them."""
+        manager = self.vector_db_manager
+        pending, self.pending_training = self.pending_training, []
+        training_vectors = [vector for _, vectors, _, _ in pending for vector in vectors]
+        with manager.lock:
+            manager.index = manager.create_vector_store(training_vectors)
+        for texts, vectors, metadatas, ids in pending:
+            self.add_embeddings(texts, vectors, metadatas, ids, ids_by_source)
+
+    def add_embeddings(self, texts, vectors, metadatas, ids, ids_by_source):
+        """Adds embedded chunks to the index and records their ids per source file."""
+        manager = self.vector_db_manager
+        with manager.lock:
+            if manager.index is None:
+                manager.index = manager.create_vector_store(vectors)
+            manager.index.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+        for metadata, doc_id in zip(metadatas, ids):
+            ids_by_source.setdefault(metadata.get('source'), []).append(doc_id)
+        self.chunks_indexed += len(ids)
+
+    def chunks_per_second(self):
+        return self.chunks_indexed / self.elapsed if self.elapsed else 0.0
+
+class MultiProcessEncoder:
+    """Encodes with a sentence-transformers multi-process pool kept open for the whole ingest."""
+
+    def __init__(self, embeddings):
+        self.model = embeddings.client
+        self.normalize = embeddings.encode_kwargs.get("normalize_embeddings", False)
+        self.pool = self.model.start_multi_process_pool()
+
+    def encode(self, texts, batch_size):
+        vectors = self.model.encode_multi_process(texts, self.pool, batch_size=batch_size)
+        if self.normalize:
+            vectors = vectors / ((vectors ** 2).sum(axis=1, keepdims=True) ** 0.5)
+        return vectors.tolist()
+
+    def close(self):
+        self.model.stop_multi_process_pool(self.pool)
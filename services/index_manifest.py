@@ -0,0 +1,79 @@
+# index_manifest.py
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+
+def file_hash(file_path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def scan_files(directory, extension='.md'):
+    """Returns the sorted, normalized paths of every file below directory with the given extension."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(extension):
+                paths.append(os.path.normpath(os.path.join(root, name)))
+    return sorted(paths)
+
+def fingerprint_files(paths, previous=None):
+    """Builds the manifest entry (mtime, size and content hash) of each file.
+
+    Parameters:
+        paths (list): Files to fingerprint.
+        previous (dict, optional): Entries of an earlier manifest. A file whose mtime and size did not
+            change reuses its previous hash instead of being read again.
+
+    Returns:
+        dict: Mapping of file path to {"mtime", "size", "sha256"}.
+    """
+    previous = previous or {}
+    fingerprints = {}
+    for path in paths:
+        stat = os.stat(path)
+        entry = previous.get(path)
+        if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            sha256 = entry["sha256"]
+        else:
+            sha256 = file_hash(path)
+        fingerprints[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": sha256}
+    return fingerprints
+
+def changed_files(previous, current):
+    """Compares two sets of fingerprints by content hash.
+
+    Returns:
+        tuple: Lists of (added, modified, removed) file paths.
+    """
+    added = [path for path in current if path not in previous]
+    removed = [path for path in previous if path not in current]
+    modified = [path for path in current if path in previous and previous[path]["sha256"] != current[path]["sha256"]]
+    return added, modified, removed
+
+def load_manifest(index_directory):
+    """Reads the manifest stored next to a saved index, or returns None when there is none."""
+    manifest_path = os.path.join(index_directory, MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Ignoring unreadable index manifest {manifest_path}: {e}")
+        return None
+
+def save_manifest(index_directory, manifest):
+    """Writes the manifest atomically so a crash never leaves a truncated file behind."""
+    os.makedirs(index_directory, exist_ok=True)
+    manifest_path = os.path.join(index_directory, MANIFEST_FILE)
+    temporary_path = manifest_path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary_path, manifest_path)
@@ -0,0 +1,202 @@
+# json_extractor.py
+
+import json
+import re
+import threading
+
+# orjson parses several times faster than the standard library when it is installed
+try:
+    import orjson
+    JSON_BACKEND = "orjson"
+    loads = orjson.loads
+except ImportError:
+    JSON_BACKEND = "json"
+    loads = json.loads
+
+# Characters that change the state of the scanner: braces, quotes and escapes
+_SCAN = re.compile(r'[{}"\'\\]')
+_WORD = re.compile(r'\w+')
+_DANGLING_KEY = re.compile(r'[{,]\s*"(?:[^"\\]|\\.)*"$')
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {'{': '}', '[': ']'}
+_STRING_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+class ParseStats:
+    """Counts the model outputs parsed as they are, parsed after a repair, and not parsed at all."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.repaired = 0
+        self.failed = 0
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            total = self.parsed + self.repaired + self.failed
+            return {
+                "parsed": self.parsed, "repaired": self.repaired, "failed": self.failed,
+                "success_rate": (self.parsed + self.repaired) / total if total else 0.0,
+                "backend": JSON_BACKEND
+            }
+
+json_parse_stats = ParseStats()
+
+def opens_string(text, position):
+    """A single quote starts a string only where a key or a value can start."""
+    position -= 1
+    while position >= 0 and text[position].isspace():
+        position -= 1
+    return position >= 0 and text[position] in '{[,:'
+
+
+def scan_objects(text):
+    """Yields (start, end) of each top-level {...} of text in one pass, ignoring braces inside strings.
+
+    end is None for an object still open when the text ends, e.g. an output cut at max_new_tokens.
+    """
+    depth = 0
+    start = None
+    quote = None
+    skip = -1
+    for match in _SCAN.finditer(text):
+        position = match.start()
+        if position < skip:
+            continue
+        char = match.group()
+        if quote:
+            if char == '\\':
+                skip = position + 2
+            elif char == quote:
+                quote = None
+        elif depth == 0:
+            if char == '{':
+                start, depth = position, 1
+        elif char == '"' or (char == "'" and opens_string(text, position)):
+            quote = char
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield start, position + 1
+    if depth:
+        yield start, None
+
+def repair(candidate):
+    """Rewrites the common defects of model-written JSON into valid JSON.
+
+    Single-quoted strings become double-quoted, raw newlines in strings are escaped, trailing commas
+    and Python literals (True, False, None) are fixed, and output cut short is closed: the open string,
+    a dangling key or colon, then every open object and array.
+    """
+    out = []
+    stack = []
+    quote = None
+    escaped = False
+    i = 0
+    while i < len(candidate):
+        char = candidate[i]
+        if quote:
+            if escaped:
+                escaped = False
+                if char == "'":
+                    out[-1] = "'"  # \' is not a JSON escape; the quote needs none in a double-quoted string
+                else:
+                    out.append(char)
+            elif char == '\\':
+                escaped = True
+                out.append(char)
+            elif char == quote:
+                quote = None
+                out.append('"')
+            elif char == '"':
+                out.append('\\"')  # A double quote inside a single-quoted string
+            else:
+                out.append(_STRING_ESCAPES.get(char, char))
+        elif char == '"' or (char == "'" and opens_string(candidate, i)):
+            quote = char
+            out.append('"')
+        elif char in _CLOSERS:
+            stack.append(char)
+            out.append(char)
+        elif char in ('}', ']'):
+            strip_trailing_comma(out)
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                break
+        elif char.isalpha():
+            word = _WORD.match(candidate, i).group()
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if quote:
+        if escaped:
+            out.pop()
+        out.append('"')
+    if stack:
+        strip_trailing_comma(out)
+        repaired = ''.join(out)
+        if repaired.endswith(':'):
+            repaired += 'null'
+        elif stack[-1] == '{' and _DANGLING_KEY.search(repaired):
+            repaired += ':null'
+        return repaired + ''.join(_CLOSERS[opener] for opener in reversed(stack))
+    return ''.join(out)
+
+def strip_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+def extract_json(text):
+    """Returns the first JSON object of a model output as a dict, or None when there is none.
+
+    Outputs that are a bare object take a single parse. Otherwise the text is scanned once for top-level
+    objects, and each one is parsed as it is, then repaired, until one succeeds. The outcome is counted
+    in json_parse_stats.
+    """
+    stripped = text.strip()
+    if stripped.startswith('{') and stripped.endswith('}'):
+        try:
+            data = loads(stripped)
+            if isinstance(data, dict):
+                json_parse_stats.record("parsed")
+                return data
+        except ValueError:
+            pass
+
+    for start, end in scan_objects(text):
+        candidate = text[start:end]
+        if end is not None:
+            try:
+                data = loads(candidate)
+                json_parse_stats.record("parsed")
+                return data
+            except ValueError:
+                pass
+        try:
+            data = loads(repair(candidate))
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            json_parse_stats.record("repaired")
+            return data
+
+    json_parse_stats.record("failed")
+    return None
+
+# Example usage:
+# extract_json('Here is the data: {"name": "Maria", "email": \'maria@email.com\',}')
+# -> {'name': 'Maria', 'email': 'maria@email.com'}
+# extract_json("{'a': 'it\\'s', 'b': True}")
+# -> {'a': "it's", 'b': True}
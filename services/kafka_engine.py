@@ -0,0 +1,189 @@
+# kafka_engine.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from services.kafka_service import flush_producer, send_message
+
+class KafkaConsumerEngine:
+    """Consumes records from Kafka in batches, processes them on a worker pool and publishes the results.
+
+    Offsets are committed manually once every result of a batch has been produced, which gives
+    at-least-once delivery: if the process dies mid-batch, the uncommitted records are consumed again.
+    A record that fails to process is sent to the dead-letter topic with its error. Without one, or when
+    the dead-letter send fails, the partition is not committed past the record, which is retried with
+    exponential backoff and skipped after max_attempts. The records after it that already succeeded are
+    not processed again when the partition is consumed anew.
+    """
+
+    def __init__(self, consumer, producer, process_message, output_topic, workers=4, max_records=16, poll_timeout_ms=1000,
+                 dead_letter_topic=None, max_attempts=5, retry_backoff=1.0, max_retry_backoff=60.0):
+        """
+        Parameters:
+            consumer (KafkaConsumer): Consumer created with enable_auto_commit=False.
+            producer (KafkaProducer): Producer used to publish the results.
+            process_message (callable): Receives a record value and returns the result to publish, or None to skip it.
+            output_topic (str): Topic the results are sent to.
+            workers (int): Number of records processed concurrently.
+            max_records (int): Maximum number of records pulled by a single poll.
+            poll_timeout_ms (int): How long a poll waits for new records.
+            dead_letter_topic (str, optional): Topic failed records are sent to, as {"topic", "partition",
+                "offset", "value", "error"} messages.
+            max_attempts (int): Attempts at a failing record before it is logged and skipped.
+            retry_backoff (float): Seconds before a failed record or batch is retried, doubled on each attempt.
+            max_retry_backoff (float): Upper bound of the retry delay.
+        """
+        self.consumer = consumer
+        self.producer = producer
+        self.process_message = process_message
+        self.output_topic = output_topic
+        self.workers = max(1, workers)
+        self.max_records = max(1, max_records)
+        self.poll_timeout_ms = poll_timeout_ms
+        self.dead_letter_topic = dead_letter_topic
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        # Failed attempts per (topic, partition, offset), and records done but not yet committed
+        self.attempts = {}
+        self.completed = set()
+        self._rewinds = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Polls and processes batches until stop() is called."""
+        logging.info(f"Consuming with {self.workers} workers, up to {self.max_records} records per poll.")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kafka-worker") as executor:
+            while not self._stopped.is_set():
+                batch = self.consumer.poll(timeout_ms=self.poll_timeout_ms, max_records=self.max_records)
+                if batch:
+                    self.process_batch(executor, batch)
+
+    @staticmethod
+    def record_key(record):
+        return record.topic, record.partition, record.offset
+
+    def process_batch(self, executor, batch):
+        """Processes every record of a poll result and commits the batch once the results are produced.
+
+        Parameters:
+            executor (Executor): Pool the records are processed on.
+            batch (dict): Mapping of TopicPartition to records, as returned by KafkaConsumer.poll.
+        """
+        records = [(partition, record) for partition, partition_records in batch.items() for record in partition_records]
+        futures = {
+            executor.submit(self.process_message, record.value): (partition, record)
+            for partition, record in records if self.record_key(record) not in self.completed
+        }
+        deliveries = []
+        dead_letters = []
+        succeeded = set()
+        # First offset of each partition to consume again, and the most attempts of a retried record
+        retry_from = {}
+        retry_attempts = 0
+
+        try:
+            for future in as_completed(futures):
+                partition, record = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.failed += 1
+                    logging.error(f"Failed to process record {record.topic}:{record.partition}@{record.offset}: {e}")
+                    if self.dead_letter_topic:
+                        dead_letters.append((partition, record, send_message(self.producer, self.dead_letter_topic, self.dead_letter(record, e))))
+                    else:
+                        retry_attempts = max(retry_attempts, self.retry(retry_from, partition, record))
+                    continue
+
+                if result is not None:
+                    deliveries.append(send_message(self.producer, self.output_topic, result))
+                succeeded.add(self.record_key(record))
+                self.processed += 1
+
+            # One flush per batch; the offsets are only committed once every result is acknowledged
+            flush_producer(self.producer)
+            failed_deliveries = [delivery for delivery in deliveries if delivery.failed()]
+            if failed_deliveries:
+                raise failed_deliveries[0].exception
+        except Exception as e:
+            self._rewinds += 1
+            delay = self.retry_delay(self._rewinds)
+            logging.error(f"Failed to produce results, rewinding batch of {len(records)} records in {delay:.1f}s: {e}")
+            self.rewind(batch)
+            self._stopped.wait(delay)
+            return
+        self._rewinds = 0
+
+        for partition, record, delivery in dead_letters:
+            if delivery.failed():
+                logging.error(f"Failed to send record {record.topic}:{record.partition}@{record.offset} to {self.dead_letter_topic}: {delivery.exception}")
+                retry_attempts = max(retry_attempts, self.retry(retry_from, partition, record))
+        for key in succeeded:
+            self.attempts.pop(key, None)
+
+        # The commit stops at the first retried record of each partition; the records after it that
+        # succeeded are remembered, so they are skipped instead of processed and produced again
+        for partition, record in records:
+            if partition in retry_from and record.offset > retry_from[partition]:
+                if self.record_key(record) in succeeded:
+                    self.completed.add(self.record_key(record))
+            else:
+                self.completed.discard(self.record_key(record))
+        for partition, offset in retry_from.items():
+            self.consumer.seek(partition, offset)
+        self.consumer.commit()
+        logging.info(f"Committed batch of {len(records)} records ({self.processed} processed, {self.failed} failed, "
+                     f"{self.skipped} skipped so far).")
+
+        if retry_from:
+            delay = self.retry_delay(retry_attempts)
+            logging.warning(f"Retrying the first failed record of {len(retry_from)} partition(s) in {delay:.1f}s.")
+            self._stopped.wait(delay)
+
+    def retry(self, retry_from, partition, record):
+        """Counts a failed attempt at a record and schedules its retry, or skips it after max_attempts.
+
+        Returns:
+            int: Number of attempts at the record so far.
+        """
+        key = self.record_key(record)
+        attempts = self.attempts.pop(key, 0) + 1
+        if attempts >= self.max_attempts:
+            self.skipped += 1
+            logging.error(f"Skipping record {record.topic}:{record.partition}@{record.offset} after {attempts} attempts: {record.value!r}")
+            return attempts
+        self.attempts[key] = attempts
+        retry_from[partition] = min(record.offset, retry_from.get(partition, record.offset))
+        return attempts
+
+    def retry_delay(self, attempts):
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.max_retry_backoff)
+
+    @staticmethod
+    def dead_letter(record, error):
+        """Builds the dead-letter message of a record that failed to process."""
+        return {
+            "topic": record.topic, "partition": record.partition, "offset": record.offset,
+            "value": record.value, "error": f"{type(error).__name__}: {error}"
+        }
+
+    def rewind(self, batch):
+        """Seeks every partition of the batch back to its first record so it is consumed again."""
+        for partition, partition_records in batch.items():
+            if partition_records:
+                self.consumer.seek(partition, partition_records[0].offset)
+
+    def stop(self):
+        """Asks the run loop to exit after the current batch."""
+        self._stopped.set()
+
+    def close(self):
+        """Stops the loop and releases the Kafka clients."""
+        self.stop()
+        flush_producer(self.producer)
+        self.producer.close()
+        self.consumer.close()
@@ -1,31 +1,76 @@
 # kafka_service.py
 
-from kafka import KafkaConsumer, KafkaProducer
 import json
+import logging
 from config.config_manager import config
+from utilities.metrics import metrics
 
-def create_kafka_consumer(topic, group_id="default_group"):
-    """Creates and returns a Kafka Consumer configured for a specific topic and group."""
+def create_kafka_consumer(topic, group_id="default_group", enable_auto_commit=True, max_poll_records=500):
+    """Creates and returns a Kafka Consumer configured for a specific topic and group.
+
+    Pass enable_auto_commit=False when offsets are committed manually after processing.
+    """
+    from kafka import KafkaConsumer
     return KafkaConsumer(
         topic,
         bootstrap_servers=[config.kafka_server],
         auto_offset_reset="earliest",
-        enable_auto_commit=True,
+        enable_auto_commit=enable_auto_commit,
         group_id=group_id,
+        max_poll_records=max_poll_records,
         value_deserializer=lambda x: json.loads(x.decode('utf-8'))
     )
 
-def create_kafka_producer():
-    """Creates and returns a Kafka Producer."""
+def create_kafka_producer(linger_ms=None, batch_size=None, compression_type=None):
+    """Creates and returns a Kafka Producer.
+
+    Parameters:
+        linger_ms (int, optional): Time the producer waits to group records into a batch. Defaults to config.kafka_linger_ms.
+        batch_size (int, optional): Maximum size in bytes of a batch per partition. Defaults to config.kafka_batch_size.
+        compression_type (str, optional): 'gzip', 'snappy', 'lz4', 'zstd' or None. Defaults to config.kafka_compression_type.
+    """
+    from kafka import KafkaProducer
     return KafkaProducer(
         bootstrap_servers=[config.kafka_server],
-        value_serializer=lambda x: json.dumps(x).encode('utf-8')
+        value_serializer=lambda x: json.dumps(x).encode('utf-8'),
+        linger_ms=config.kafka_linger_ms if linger_ms is None else linger_ms,
+        batch_size=config.kafka_batch_size if batch_size is None else batch_size,
+        compression_type=compression_type or config.kafka_compression_type
     )
 
-def send_message(producer, topic, message):
-    """Sends a message to a specified topic using the given producer."""
-    producer.send(topic, value=message)
-    producer.flush()  # Ensure all messages are sent before returning
+def log_delivery_error(exception):
+    """Default error callback of send_message."""
+    logging.error(f"Failed to deliver message to Kafka: {exception}")
+
+def send_message(producer, topic, message, on_success=None, on_error=log_delivery_error, block=False):
+    """Sends a message to a specified topic using the given producer.
+
+    The send is non-blocking: the record is queued in the producer's batch and the callbacks fire once
+    the broker acknowledges it. Call flush_producer at the end of a batch or on shutdown.
+
+    Parameters:
+        on_success (callable, optional): Called with the RecordMetadata once the message is delivered.
+        on_error (callable, optional): Called with the exception if the delivery fails.
+        block (bool): Wait for the broker acknowledgement before returning.
+
+    Returns:
+        FutureRecordMetadata: The future of the send.
+    """
+    with metrics.timer("send_message", topic=topic):
+        future = producer.send(topic, value=message)
+    if metrics.enabled:
+        future.add_errback(lambda exception: metrics.inc("errors_total", stage="kafka_delivery"))
+    if on_success is not None:
+        future.add_callback(on_success)
+    if on_error is not None:
+        future.add_errback(on_error)
+    if block:
+        future.get()
+    return future
+
+def flush_producer(producer, timeout=None):
+    """Blocks until every queued message has been sent."""
+    producer.flush(timeout=timeout)
 
 def receive_messages(consumer, handle_message):
     """Receives messages from a specified consumer and processes them using a callback function."""
@@ -0,0 +1,110 @@
+# label_matcher.py
+
+import re
+import unicodedata
+
+# Canonical intent labels and the synonyms the models answer with, English and Portuguese
+INTENT_LABELS = {
+    "Accusation": ["Acusação", "Denúncia"],
+    "Booking": ["Reserva", "Agendamento"],
+    "Information Request": ["Pedido de Informação", "Solicitação de Informação", "Pedido de Informações",
+                            "Solicitação de Informações"],
+    "General Commentary": ["Comentário Geral"],
+    "Complaint": ["Reclamação", "Queixa"],
+    "Compliment": ["Elogio"],
+}
+
+# Sentiment labels in priority order: when several are mentioned, the first one in this order wins
+SENTIMENT_LABELS = {
+    "positive": ["professional", "polite", "encouraging", "good", "positivo", "positiva", "profissional",
+                 "educado", "educada", "bom", "boa"],
+    "negative": ["problematic", "difficult", "bad", "negativo", "negativa", "problemático", "difícil", "ruim"],
+    "neutral": ["objective", "impartial", "fair", "neutro", "neutra", "objetivo", "imparcial"],
+}
+
+def fold_accents(text):
+    """Removes the diacritics of text, e.g. 'Reclamação' -> 'Reclamacao'."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+def normalize_term(term):
+    """Lookup key of a label or synonym: lower case, single spaces, no accents."""
+    return fold_accents(' '.join(term.lower().split()))
+
+def trie_pattern(terms):
+    """Builds a regex matching any of terms, factored into a prefix tree.
+
+    Python's re tries the branches of a flat alternation one after the other at every position of the
+    text; with the common prefixes factored out, each position costs at most one test per character.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[None] = None
+
+    def build(node):
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + build(child)
+            for char, child in sorted(node.items(), key=lambda item: item[0] or '') if char is not None
+        ]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A term ending here is also a prefix of longer ones: the optional group still prefers the longest match
+        return f'(?:{body})?' if None in node else body
+
+    return build(trie)
+
+class LabelMatcher:
+    """Maps free-form model output to one of a fixed set of labels with a single precompiled regex.
+
+    Every label and synonym, with and without accents, is compiled once into one prefix-tree pattern, so
+    a lookup is a single scan of the lower-cased text plus a dictionary lookup of the matched term.
+    """
+
+    def __init__(self, labels, default, priority=False):
+        """
+        Parameters:
+            labels (dict): Canonical label -> synonyms; the label itself always matches, case-insensitively.
+            default (str): Returned when no label is found.
+            priority (bool): Return the mentioned label that comes first in labels instead of the
+                leftmost mention in the text.
+        """
+        self.labels = list(labels)
+        self.default = default
+        self.priority = priority
+        self._terms = {}
+        terms = set()
+        for rank, (label, synonyms) in enumerate(labels.items()):
+            for term in (label, *synonyms):
+                self._terms.setdefault(normalize_term(term), (rank, label))
+                term = ' '.join(term.lower().split())
+                terms.update((term, fold_accents(term)))
+        self.pattern = re.compile(r'\b' + trie_pattern(terms) + r'\b')
+
+    def lookup(self, matched):
+        return self._terms[normalize_term(matched)]
+
+    def match(self, text):
+        """Returns the canonical label found in text, or the default."""
+        text = text.lower()
+        if not self.priority:
+            match = self.pattern.search(text)
+            return self.lookup(match.group())[1] if match else self.default
+
+        best = None
+        for match in self.pattern.finditer(text):
+            rank, label = self.lookup(match.group())
+            if rank == 0:
+                return label
+            if best is None or rank < best[0]:
+                best = (rank, label)
+        return best[1] if best else self.default
+
+intent_matcher = LabelMatcher(INTENT_LABELS, default="Undefined")
+sentiment_matcher = LabelMatcher(SENTIMENT_LABELS, default="undefined", priority=True)
+
+# Example usage:
+# intent_matcher.match('The intent is "Reclamação".')  # -> 'Complaint'
+# sentiment_matcher.match("O sentimento da conversa é negativo.")  # -> 'negative'
@@ -0,0 +1,91 @@
+# lexical_index.py
+
+import heapq
+import math
+from collections import Counter
+from utilities.keyword_extractor import tokenize
+
+class BM25Index:
+    """In-process inverted index scoring documents with Okapi BM25.
+
+    Documents are keyed by their docstore id and tokenized like the retrieval keywords (lower case, no
+    accents), so an extracted keyword is an exact term of the index.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc_id: term frequency}
+        self.postings = {}
+        # doc_id -> its distinct terms, so a removal only touches their postings
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.doc_terms[doc_id] = list(counts)
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id):
+            documents = self.postings[term]
+            del documents[doc_id]
+            if not documents:
+                del self.postings[term]
+
+    def search(self, query, k=3):
+        """Returns the k best (doc_id, score) pairs for the terms of query, best first."""
+        return self.search_terms(tokenize(query), k)
+
+    def search_terms(self, terms, k=3):
+        """Like search, for already tokenized terms, e.g. a query without its stopwords."""
+        if not self.doc_lengths:
+            return []
+        num_docs = len(self.doc_lengths)
+        average_length = self.total_length / num_docs or 1.0
+        scores = {}
+        for term in set(terms):
+            documents = self.postings.get(term)
+            if not documents:
+                continue
+            idf = math.log(1 + (num_docs - len(documents) + 0.5) / (len(documents) + 0.5))
+            for doc_id, frequency in documents.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+def reciprocal_rank_fusion(rankings, k=3, rrf_k=60):
+    """Fuses several rankings of the same items with reciprocal rank fusion.
+
+    Parameters:
+        rankings (list): Lists of item keys, best first.
+        k (int): Number of fused items returned.
+        rrf_k (int): Damping constant; 60 is the usual value.
+
+    Returns:
+        list: (key, fused score) pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+# Example usage:
+# index = BM25Index()
+# index.add("chunk-1", "Manutenção de semáforos na Avenida Paulista")
+# index.search("semaforos")  # -> [('chunk-1', 0.28...)]
@@ -1,8 +1,15 @@
 # llm_processing.py
 import json
+import logging
+import time
 import uuid
-import re
+from contextvars import copy_context
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from config.config_manager import config
 from llms.llm_config import llm_config
+from services.json_extractor import extract_json
+from services.label_matcher import LabelMatcher, intent_matcher, sentiment_matcher
 
 class LLMProcessor:
     EXPECTED_FIELDS = {
@@ -10,32 +17,37 @@ class LLMProcessor:
         "department", "issue", "service",
         "additional_information", "detailed_description"
     }
-
-    def __init__(self):
-        """ Initialize the LLMProcessor with necessary settings. """
-    
-    @staticmethod
-    def extract_single_intent(response_text):
-        valid_intents = [
-            "Accusation", "Booking", "Information Request", 
-            "General Commentary", "Complaint", "Compliment"
-        ]
-        pattern = r'(?:"|\')?(\b' + '|'.join(valid_intents) + r'\b)(?:"|\')?'
-        match = re.search(pattern, response_text, re.IGNORECASE)
-        return match.group(1) if match else "Undefined"
-
-    @staticmethod
-    def extract_sentiment(text):
-        """Extracts the sentiment from a sentence by searching for specific keywords."""
-        patterns = {
-            'positive': re.compile(r'\b(positive|professional|polite|encouraging|good)\b', re.IGNORECASE),
-            'negative': re.compile(r'\b(negative|problematic|difficult|bad)\b', re.IGNORECASE),
-            'neutral': re.compile(r'\b(neutral|objective|impartial|fair)\b', re.IGNORECASE)
-        }
-        for sentiment, pattern in patterns.items():
-            if pattern.search(text):
-                return sentiment
-        return 'undefined'
+    COMBINED_FIELDS = {"intent", "sentiment", "summary"}
+    ANALYSIS_TEMPLATES = ['intent_classification', 'summary_classification', 'sentiment_classification']
+
+    def __init__(self, max_concurrency=None, combined=False, stream_interval=None, intent_labels=None, sentiment_labels=None):
+        """ Initialize the LLMProcessor with necessary settings.
+
+        Parameters:
+            max_concurrency (int, optional): Maximum number of LLM chains run at the same time for a
+                single conversation. 1 keeps the serial behaviour. Defaults to config.llm_concurrency.
+            combined (bool): Ask for the data, intent, sentiment and summary of a conversation with a single
+                'combined' prompt, falling back to the separate chains when its JSON cannot be used. Audio
+                transcriptions always go through the separate chains and the 'audio_extraction' template.
+            stream_interval (float, optional): Minimum seconds between two partial summaries passed to
+                on_event while the summary streams. Defaults to config.llm_stream_interval.
+            intent_labels (dict, optional): Intent label -> synonyms, replacing label_matcher.INTENT_LABELS.
+            sentiment_labels (dict, optional): Sentiment label -> synonyms in priority order, replacing
+                label_matcher.SENTIMENT_LABELS.
+        """
+        self.max_concurrency = max(1, max_concurrency or config.llm_concurrency)
+        self.combined = combined
+        self.stream_interval = config.llm_stream_interval if stream_interval is None else stream_interval
+        self.intent_matcher = LabelMatcher(intent_labels, default="Undefined") if intent_labels else intent_matcher
+        self.sentiment_matcher = LabelMatcher(sentiment_labels, default="undefined", priority=True) if sentiment_labels else sentiment_matcher
+
+    def extract_single_intent(self, response_text):
+        """Returns the canonical intent mentioned in the model output, or "Undefined"."""
+        return self.intent_matcher.match(response_text)
+
+    def extract_sentiment(self, text):
+        """Returns the sentiment mentioned in the model output ('positive', 'negative' or 'neutral'), or 'undefined'."""
+        return self.sentiment_matcher.match(text)
 
     def score_output(self, json_data, intent):
         score = 0
@@ -50,76 +62,181 @@ class LLMProcessor:
         return score
 
     def extract_and_format_json(self, text_content):
-        json_data = None
-        try:
-            json_start = text_content.find('{')
-            json_end = text_content.rfind('}') + 1
-            if json_start != -1 and json_end != -1:
-                json_string = text_content[json_start:json_end]
-                json_data = json.loads(json_string)
-        except json.JSONDecodeError:
-            pass
-
-        output = json_data if json_data else {}
-        return output
-
-    def process_text_and_extract_data(self, conversation_text):
-        conversation_id = str(uuid.uuid4())
-        response_data = llm_config.invoke(conversation_text)
-        response_intent = llm_config.invoke(conversation_text, template_type='intent_classification')
+        """Returns the first JSON object of the model output, repaired when needed, or {}."""
+        return extract_json(text_content) or {}
+
+    def invoke_templates(self, text, template_types):
+        """Runs one LLM chain per template type over the same text and returns the responses.
+
+        The chains are independent, so when max_concurrency is above 1 they are submitted to a
+        bounded thread pool and joined; otherwise they run one after the other.
+
+        Parameters:
+            text (str): The conversation or transcription passed to every chain.
+            template_types (list): Template types understood by LLMConfig.invoke.
+
+        Returns:
+            dict: The chain response for each template type.
+        """
+        workers = min(self.max_concurrency, len(template_types))
+        if workers <= 1:
+            return {template_type: llm_config.invoke(text, template_type=template_type) for template_type in template_types}
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-chain") as executor:
+            # Each chain runs in a copy of this context, so it is timed in the trace of the conversation
+            futures = {
+                template_type: executor.submit(copy_context().run, llm_config.invoke, text, template_type)
+                for template_type in template_types
+            }
+            return {template_type: future.result() for template_type, future in futures.items()}
+
+    def build_output(self, responses, extraction_type):
+        """Turns the raw chain responses into the data, intent, summary and sentiment of a conversation."""
+        json_data = self.extract_and_format_json(responses[extraction_type].get('text', '{}'))
+        intent = self.extract_single_intent(responses['intent_classification'].get('text', '{}'))
+        summary = responses['summary_classification'].get('text', '{}')
+        sentiment = self.extract_sentiment(responses['sentiment_classification'].get('text', '{}'))
+
+        return {
+            "data": json_data,
+            "intent": intent,
+            "sentiment": sentiment,
+            "summary": summary,
+            # Calculate the output score after processing data and intents
+            "output_score": self.score_output(json_data, intent)
+        }
 
-        json_data = self.extract_and_format_json(response_data.get('text', '{}'))
-        intent = self.extract_single_intent(response_intent.get('text', '{}'))
+    def build_combined_output(self, response):
+        """Parses the answer of the 'combined' template.
 
-        response_summary = llm_config.invoke(conversation_text, template_type='summary_classification')
-        response_sentiment = llm_config.invoke(conversation_text, template_type='sentiment_classification')
+        Returns:
+            dict: The same keys as build_output, or None when the JSON is malformed or incomplete.
+        """
+        combined = self.extract_and_format_json(response.get('text', '{}'))
+        if not self.COMBINED_FIELDS.issubset(combined):
+            return None
 
-        summary = response_summary.get('text', '{}')
-        sentiment = self.extract_sentiment(response_sentiment.get('text', '{}'))
+        json_data = {key: value for key, value in combined.items() if key not in self.COMBINED_FIELDS}
+        if not json_data:
+            return None
 
-        # Calculate the output score after processing data and intents
-        output_score = self.score_output(json_data, intent)
+        intent = self.extract_single_intent(str(combined['intent']))
+        return {
+            "data": json_data,
+            "intent": intent,
+            "sentiment": self.extract_sentiment(str(combined['sentiment'])),
+            "summary": str(combined['summary']),
+            "output_score": self.score_output(json_data, intent)
+        }
+
+    def stream_summary(self, text, on_event):
+        """Streams the summary chain, passing the text generated so far to on_event at most every stream_interval seconds."""
+        tokens = []
+        last_event = time.monotonic()
+        for token in llm_config.stream(text, template_type='summary_classification'):
+            tokens.append(token)
+            now = time.monotonic()
+            if now - last_event >= self.stream_interval:
+                on_event("summary", ''.join(tokens), False)
+                last_event = now
+
+        summary = ''.join(tokens)
+        on_event("summary", summary, True)
+        return summary
+
+    def analyze_streaming(self, text, extraction_type, on_event):
+        """Runs the four chains like analyze, calling on_event(field, value, final) as soon as a result is known.
+
+        The summary is streamed token by token; data, intent and sentiment are passed on when their chain returns.
+        """
+        def run(template_type):
+            if template_type == 'summary_classification':
+                return "summary", self.stream_summary(text, on_event)
+
+            response_text = llm_config.invoke(text, template_type=template_type).get('text', '{}')
+            if template_type == 'intent_classification':
+                field, value = "intent", self.extract_single_intent(response_text)
+            elif template_type == 'sentiment_classification':
+                field, value = "sentiment", self.extract_sentiment(response_text)
+            else:
+                field, value = "data", self.extract_and_format_json(response_text)
+            on_event(field, value, True)
+            return field, value
+
+        # The summary goes first so that it starts streaming even when the chains run serially
+        template_types = ['summary_classification', extraction_type, 'intent_classification', 'sentiment_classification']
+        workers = min(self.max_concurrency, len(template_types))
+        if workers <= 1:
+            results = dict(run(template_type) for template_type in template_types)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-chain") as executor:
+                futures = [executor.submit(copy_context().run, run, template_type) for template_type in template_types]
+                results = dict(future.result() for future in futures)
+
+        return {
+            "data": results["data"],
+            "intent": results["intent"],
+            "sentiment": results["sentiment"],
+            "summary": results["summary"],
+            "output_score": self.score_output(results["data"], results["intent"])
+        }
+
+    def analyze(self, text, extraction_type, on_event=None):
+        """Runs the combined prompt when enabled for a conversation, otherwise (or when it fails) the four separate chains.
+
+        Parameters:
+            text (str): The conversation or transcription.
+            extraction_type (str): Template type of the data extraction chain.
+            on_event (callable, optional): Called as on_event(field, value, final) with the data, intent,
+                sentiment and summary as soon as each is available; the summary is streamed token by token.
+        """
+        # The combined template only describes the text extraction, not the audio_extraction fields
+        if self.combined and extraction_type == 'extraction':
+            output = self.build_combined_output(llm_config.invoke(text, template_type='combined'))
+            if output is not None:
+                if on_event is not None:
+                    for field in ("data", "intent", "sentiment", "summary"):
+                        on_event(field, output[field], True)
+                return output
+            logging.warning("Combined extraction returned malformed JSON, falling back to separate chains.")
+
+        if on_event is not None:
+            return self.analyze_streaming(text, extraction_type, on_event)
+
+        responses = self.invoke_templates(text, [extraction_type] + self.ANALYSIS_TEMPLATES)
+        if extraction_type == 'audio_extraction':
+            print(responses[extraction_type])
+        return self.build_output(responses, extraction_type)
+
+    def process_text_and_extract_data(self, conversation_text, on_event=None):
+        """Analyzes a conversation and returns the JSON result.
+
+        on_event, when given, is called as on_event(conversation_id, field, value, final) with the
+        conversation text first and then each result as it becomes available.
+        """
+        conversation_id = str(uuid.uuid4())
+        if on_event is not None:
+            on_event = partial(on_event, conversation_id)
+            on_event("conversation_text", conversation_text, True)
 
         formatted_output = {
             "conversation_id": conversation_id,
             "conversation_text": conversation_text,
-            "data": json_data,
-            "intent": intent,
-            "sentiment": sentiment,
-            "summary": summary,
-            "output_score": output_score
+            **self.analyze(conversation_text, 'extraction', on_event)
         }
 
         return json.dumps(formatted_output, indent=4)
     
-    def process_audio_and_extract_data(self, transcription):
+    def process_audio_and_extract_data(self, transcription, on_event=None):
         conversation_id = str(uuid.uuid4())
-        
-        response_data = llm_config.invoke(transcription, template_type='audio_extraction')
-        response_intent = llm_config.invoke(transcription, template_type='intent_classification')
-        
-        print(response_data)
-        
-        json_data = self.extract_and_format_json(response_data.get('text', '{}'))
-        intent = self.extract_single_intent(response_intent.get('text', '{}'))
-
-        response_summary = llm_config.invoke(transcription, template_type='summary_classification')
-        response_sentiment = llm_config.invoke(transcription, template_type='sentiment_classification')
-
-        summary = response_summary.get('text', '{}')
-        sentiment = self.extract_sentiment(response_sentiment.get('text', '{}'))
-
-        # Calculate the output score after processing data and intents
-        output_score = self.score_output(json_data, intent)
+        if on_event is not None:
+            on_event = partial(on_event, conversation_id)
+            on_event("transcription", transcription, True)
 
         formatted_output = {
             "conversation_id": conversation_id,
             "transcription": transcription,
-            "data": json_data,
-            "intent": intent,
-            "sentiment": sentiment,
-            "summary": summary,
-            "output_score": output_score
+            **self.analyze(transcription, 'audio_extraction', on_event)
         }
 
         return json.dumps(formatted_output, indent=4)
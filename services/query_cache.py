@@ -0,0 +1,87 @@
+# query_cache.py
+
+import threading
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+class LRUCache:
+    """A small thread-safe least-recently-used cache with hit and miss counters."""
+
+    def __init__(self, maxsize=1024):
+        """
+        Parameters:
+            maxsize (int): Maximum number of entries kept. 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Returns the size and hit/miss counters of the cache."""
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wraps an Embeddings model and remembers the vectors of recent queries.
+
+    Retrieval queries come from a small vocabulary of repeated keywords, so most of them are answered
+    from the cache instead of running the encoder again. Document embeddings are never cached.
+    """
+
+    def __init__(self, embeddings, maxsize=1024):
+        """
+        Parameters:
+            embeddings (Embeddings): The model doing the actual encoding.
+            maxsize (int): Number of query vectors kept.
+        """
+        self.embeddings = embeddings
+        self.cache = LRUCache(maxsize)
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's attributes (client, encode_kwargs, ...)
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        """Embeds several queries, encoding all the ones missing from the cache in a single call."""
+        vectors = [self.cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for text, vector in encoded.items():
+                self.cache.put(text, vector)
+            vectors = [vector if vector is not None else encoded[text] for text, vector in zip(texts, vectors)]
+        return vectors
@@ -0,0 +1,231 @@
+# result_sink.py
+
+import json
+import os
+import threading
+from services.csv_service import CsvWriter, batched, iter_csv, iter_csv_batches
+
+# Columns of a processed conversation in tabular form; the extracted fields come from LLMProcessor.EXPECTED_FIELDS
+DATA_FIELDS = [
+    "name", "email", "phone_number", "location", "department", "issue", "service",
+    "additional_information", "detailed_description"
+]
+RESULT_COLUMNS = ["file_path", "conversation_id", "intent", "sentiment", "summary", "output_score"] + DATA_FIELDS + ["related_documents"]
+COLUMNAR_FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+def flatten_result(result):
+    """Turns a processed conversation into one flat row of RESULT_COLUMNS.
+
+    The extracted fields of the nested 'data' dict become columns; values that are not scalars
+    (lists, nested dicts, related documents) are JSON-encoded.
+    """
+    data = result.get("data") or {}
+    row = {column: result.get(column) for column in RESULT_COLUMNS if column not in DATA_FIELDS}
+    row.update({field: data.get(field) for field in DATA_FIELDS})
+    for column, value in row.items():
+        if isinstance(value, (dict, list)):
+            row[column] = json.dumps(value, ensure_ascii=False)
+    return row
+
+def import_pyarrow():
+    """Imports pyarrow, which only the Parquet and Arrow sinks and readers need, on first use."""
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow is required to write or read Parquet and Arrow results (pip install pyarrow)")
+    return pa
+
+def result_schema():
+    pa = import_pyarrow()
+    return pa.schema([
+        (column, pa.float64() if column == "output_score" else pa.string()) for column in RESULT_COLUMNS
+    ])
+
+# Every sink buffers up to batch_rows results. write() and flush() return the results they wrote to
+# disk, so a caller can record them as done (see BatchRunner) without forcing a flush of its own.
+
+class JsonlSink:
+    """Appends every result as one JSON line to a file kept open for the whole run."""
+
+    def __init__(self, path, batch_rows=1000):
+        self.path = path
+        self.batch_rows = max(1, batch_rows)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._results = []
+        self._lines = []
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._results.append(result)
+            self._lines.append(line)
+            if len(self._lines) >= self.batch_rows:
+                return self._write_lines()
+        return []
+
+    def flush(self):
+        with self._lock:
+            return self._write_lines()
+
+    def _write_lines(self):
+        written, self._results = self._results, []
+        self._file.write("".join(self._lines))
+        self._lines = []
+        self._file.flush()
+        return written
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class CsvSink:
+    """Appends every result as a flat CSV row (see flatten_result) through a buffered CsvWriter."""
+
+    def __init__(self, path, batch_rows=1000):
+        self.path = path
+        self._writer = CsvWriter(path, RESULT_COLUMNS, buffer_rows=batch_rows)
+        self._results = []
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        row = flatten_result(result)
+        with self._lock:
+            self._results.append(result)
+            if self._writer.write(row):
+                written, self._results = self._results, []
+                return written
+        return []
+
+    def flush(self):
+        with self._lock:
+            self._writer.flush()
+            written, self._results = self._results, []
+            return written
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+
+class ColumnarSink:
+    """Writes flat results (see flatten_result) as Parquet or Arrow IPC files for analytics.
+
+    Neither format can be appended to once its file is closed, so path is a directory of part files,
+    read as one dataset by pyarrow, pandas or DuckDB. Rows are buffered and written as a new, complete
+    part file every batch_rows rows and on flush(), so a written result survives a crash.
+    """
+
+    def __init__(self, path, file_format="parquet", batch_rows=1000):
+        """
+        Parameters:
+            path (str): Directory of the part files, created when missing.
+            file_format (str): 'parquet' (zstd-compressed) or 'arrow'.
+            batch_rows (int): Rows buffered before they are written, unless flush() comes first.
+        """
+        self.pa = import_pyarrow()
+        self.path = path
+        self.file_format = file_format
+        self.batch_rows = max(1, batch_rows)
+        self.schema = result_schema()
+        self._rows = []
+        self._results = []
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        # A restarted run adds parts after the existing ones
+        parts = [name for name in os.listdir(path) if name.startswith("part-") and name.endswith("." + file_format)]
+        self._part = max((int(name[5:10]) for name in parts), default=-1) + 1
+
+    def write(self, result):
+        row = {
+            column: value if value is None or column == "output_score" else str(value)
+            for column, value in flatten_result(result).items()
+        }
+        with self._lock:
+            self._rows.append(row)
+            self._results.append(result)
+            if len(self._rows) >= self.batch_rows:
+                return self._write_part()
+        return []
+
+    def flush(self):
+        with self._lock:
+            return self._write_part()
+
+    def close(self):
+        self.flush()
+
+    def _write_part(self):
+        if not self._rows:
+            return []
+        pa = self.pa
+        table = pa.Table.from_pylist(self._rows, schema=self.schema)
+        written, self._rows, self._results = self._results, [], []
+        # Written under a temporary name and renamed, so readers never see a partial file
+        part_path = os.path.join(self.path, f"part-{self._part:05d}.{self.file_format}")
+        self._part += 1
+        temp_path = part_path + ".tmp"
+        if self.file_format == "parquet":
+            pa.parquet.write_table(table, temp_path, compression="zstd")
+        else:
+            with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, self.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, part_path)
+        return written
+
+def open_sink(path, batch_rows=1000):
+    """Returns the sink for an output path, chosen by extension.
+
+    .parquet, .arrow and .feather give a ColumnarSink, .csv a CsvSink and anything else a JsonlSink.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in COLUMNAR_FORMATS:
+        return ColumnarSink(path, COLUMNAR_FORMATS[extension], batch_rows=batch_rows)
+    if extension == ".csv":
+        return CsvSink(path, batch_rows=batch_rows)
+    return JsonlSink(path, batch_rows=batch_rows)
+
+def iter_record_batches(path, batch_size=10000):
+    """Yields the results of a Parquet or Arrow output as pyarrow RecordBatches, without loading it whole."""
+    pa = import_pyarrow()
+    file_format = COLUMNAR_FORMATS.get(os.path.splitext(path)[1].lower(), "parquet")
+    if os.path.isdir(path):
+        # Only the complete parts, not the temporary file of a part being written
+        files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith("." + file_format))
+    else:
+        files = [path]
+    dataset = pa.dataset.dataset(files, format="ipc" if file_format == "arrow" else "parquet")
+    yield from dataset.to_batches(batch_size=batch_size)
+
+def iter_results(path, batch_size=None):
+    """Streams the results of an output written by any sink.
+
+    Parameters:
+        path (str): Output file (or part directory) given to open_sink.
+        batch_size (int, optional): Yield lists of at most batch_size rows instead of single rows.
+
+    Returns:
+        generator: Result dictionaries (flat rows for CSV and columnar outputs), or lists of them.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in COLUMNAR_FORMATS:
+        batches = (batch.to_pylist() for batch in iter_record_batches(path, batch_size or 10000))
+        if batch_size:
+            yield from batches
+        else:
+            for batch in batches:
+                yield from batch
+    elif extension == ".csv":
+        yield from iter_csv_batches(path, batch_size) if batch_size else iter_csv(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = (json.loads(line) for line in file if line.strip())
+            yield from batched(rows, batch_size) if batch_size else rows
+
+# Example usage:
+# sink = open_sink("results.parquet")
+# sink.write(result)
+# sink.close()
+# for batch in iter_record_batches("results.parquet"):
+#     print(batch.num_rows)
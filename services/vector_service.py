@@ -1,32 +1,286 @@
 import os
-import re
+import threading
 import torch
-import pandas as pd
-from langchain_community.vectorstores import FAISS
+import numpy as np
 from langchain_community.document_loaders import DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_community.document_loaders import UnstructuredMarkdownLoader
 from langchain.text_splitter import MarkdownTextSplitter
+from services.ann_index import StableIdFAISS, build_faiss_index, create_vector_store, set_search_params
+from services.embedding_pipeline import EmbeddingPipeline
+from services.index_manifest import changed_files, fingerprint_files, load_manifest, save_manifest, scan_files
+from services.lexical_index import BM25Index, reciprocal_rank_fusion
+from services.query_cache import CachedQueryEmbeddings, LRUCache
+from utilities.keyword_extractor import keyword_extractor
+from utilities.metrics import metrics
 
 class VectorDatabaseManager:
-    def __init__(self, content_directory='../content', model_name='sentence-transformers/all-mpnet-base-v2'):
+    def __init__(self, content_directory='../content', model_name='sentence-transformers/all-mpnet-base-v2', index_directory=None,
+                 query_cache_size=1024, result_cache_size=1024):
+        """
+        Parameters:
+            content_directory (str): Directory holding the markdown knowledge base.
+            model_name (str): Sentence-transformers model used for the embeddings.
+            index_directory (str, optional): Where the FAISS index and its manifest are saved. When set, a start
+                loads the saved index and only re-embeds the markdown files that changed since it was saved.
+            query_cache_size (int): Number of query embeddings kept in an LRU cache.
+            result_cache_size (int): Number of search results, keyed by query, k and threshold, kept in an LRU
+                cache. It is cleared whenever the index changes. 0 disables it.
+        """
         self.content_directory = content_directory
         self.model_name = model_name
+        self.index_directory = index_directory
         self.model_kwargs = {"device": "cuda" if torch.cuda.is_available() else "cpu"}
         self.encode_kwargs = {"normalize_embeddings": False}
+        self.chunk_size = 512
+        self.chunk_overlap = 0
+        self.embeddings = None
+        self.query_cache_size = query_cache_size
+        self.result_cache = LRUCache(result_cache_size)
         self.index = None
+        # BM25 index over the same chunks, built from the docstore on first use
+        self.lexical_index = None
         self.file_paths = []
+        # Streaming ingest: load files in a process pool and embed/add chunks batch by batch
+        self.streaming_ingest = False
+        self.embed_batch_size = 256
+        self.ingest_workers = None
+        self.multi_process_embeddings = False
+        # FAISS index type ('flat', 'ivf_flat', 'ivf_pq' or 'hnsw'), its build parameters and search-time knobs
+        self.index_type = 'flat'
+        self.nlist = None
+        self.pq_m = 48
+        self.hnsw_m = 32
+        self.nprobe = 8
+        self.ef_search = 64
+        # Maximum number of vectors sampled to train the IVF variants
+        self.train_size = 65536
+        # Fingerprint and chunk ids of every indexed file, keyed by path
+        self.manifest = self.build_manifest({})
+        # Guards the index and manifest against the content watcher updating them during a search
+        self.lock = threading.RLock()
 
     def initialize(self):
-        md_data = self.read_md_files()
-        print(f"Number of Documents: {len(md_data)}")
-        chunks = self.texts_to_vectors(md_data)
-        print(f"Number of Chunks: {len(chunks)}")
-        self.index = self.initialize_vector_db(chunks)
+        with self.lock:
+            if self.load_index():
+                self.sync()
+            elif self.streaming_ingest:
+                self.build_index_streaming()
+            else:
+                fingerprints = fingerprint_files(scan_files(self.content_directory))
+                md_data = self.read_md_files()
+                print(f"Number of Documents: {len(md_data)}")
+                chunks = self.texts_to_vectors(md_data)
+                print(f"Number of Chunks: {len(chunks)}")
+                self.index = self.initialize_vector_db(chunks)
+                self.manifest = self.build_manifest(self.attach_chunk_ids(fingerprints))
+                self.save_index()
+            self.result_cache.clear()
+            self.lexical_index = None
         self.file_paths = [os.path.join(self.content_directory, file) for file in os.listdir(self.content_directory)]
         return self.index, self.file_paths
 
+    def build_index_streaming(self):
+        """Builds the index with the EmbeddingPipeline, keeping peak memory bounded for large corpora."""
+        file_paths = scan_files(self.content_directory)
+        print(f"Number of Documents: {len(file_paths)}")
+        fingerprints = fingerprint_files(file_paths)
+        self.index = None
+        pipeline = EmbeddingPipeline(
+            self, batch_size=self.embed_batch_size, load_workers=self.ingest_workers, multi_process=self.multi_process_embeddings
+        )
+        ids_by_source = pipeline.run(file_paths)
+        self.manifest = self.build_manifest({
+            path: {**fingerprint, "ids": ids_by_source.get(path, [])} for path, fingerprint in fingerprints.items()
+        })
+        self.save_index()
+
+    def build_manifest(self, files):
+        """Describes what an index was built from; a saved index built with other settings is discarded."""
+        return {
+            "model_name": self.model_name,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            **self.index_params(),
+            "files": files
+        }
+
+    def attach_chunk_ids(self, fingerprints):
+        """Adds to each file fingerprint the docstore ids of the chunks built from that file."""
+        ids_by_source = {}
+        for doc_id in self.index.index_to_docstore_id.values():
+            source = self.index.docstore.search(doc_id).metadata.get('source')
+            if source:
+                ids_by_source.setdefault(os.path.normpath(source), []).append(doc_id)
+        return {
+            path: {**fingerprint, "ids": ids_by_source.get(os.path.normpath(path), [])}
+            for path, fingerprint in fingerprints.items()
+        }
+
+    def load_index(self):
+        """Loads the saved index when it was built with the current model and chunking settings.
+
+        Returns:
+            bool: True if the index was loaded, False if it has to be built.
+        """
+        if not self.index_directory:
+            return False
+
+        manifest = load_manifest(self.index_directory)
+        expected = self.build_manifest({})
+        if manifest is None or any(manifest.get(key) != value for key, value in expected.items() if key != "files"):
+            return False
+
+        try:
+            self.index = StableIdFAISS.load_local(self.index_directory, self.get_embeddings(), allow_dangerous_deserialization=True)
+        except Exception as e:
+            print(f"Failed to load the saved index from {self.index_directory}: {e}")
+            return False
+
+        set_search_params(self.index.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        self.manifest = manifest
+        # Manifest keys are normalized paths, like the chunk sources they are matched with
+        self.manifest["files"] = {os.path.normpath(path): entry for path, entry in manifest["files"].items()}
+        if any("ids" not in entry for entry in manifest["files"].values()):
+            # Manifests written before chunk ids were tracked: recover them from the docstore
+            self.manifest["files"] = self.attach_chunk_ids(manifest["files"])
+        print(f"Loaded saved index from {self.index_directory}")
+        return True
+
+    def save_index(self):
+        """Saves the index and its manifest to index_directory, if configured."""
+        if not self.index_directory or self.index is None:
+            return
+        with self.lock:
+            self.index.save_local(self.index_directory)
+            save_manifest(self.index_directory, self.manifest)
+        print(f"Saved index to {self.index_directory}")
+
+    def sync(self, persist=True):
+        """Brings the index in line with the content directory, re-embedding only the files that changed.
+
+        Unchanged files are recognised by their mtime and size without being read, and files whose
+        content hash did not change are never re-embedded. The changed files are embedded before the
+        lock is taken, so searches only wait for the index and manifest to be swapped.
+
+        Returns:
+            tuple: Lists of (added, modified, removed) file paths.
+        """
+        with self.lock:
+            indexed = dict(self.manifest["files"])
+        fingerprints = fingerprint_files(scan_files(self.content_directory), indexed)
+        added, modified, removed = changed_files(indexed, fingerprints)
+        embedded = {path: self.embed_document(path) for path in added + modified}
+
+        with self.lock:
+            for path in removed:
+                self.remove_document_from_index(path, persist=False)
+            for path in added + modified:
+                self.add_document_to_index(path, persist=False, fingerprint=fingerprints[path], embedded=embedded[path])
+
+            # Files that were only touched keep their chunks; record the new mtimes
+            for path, fingerprint in fingerprints.items():
+                if path in self.manifest["files"]:
+                    self.manifest["files"][path].update(fingerprint)
+
+            if added or modified or removed:
+                print(f"Index updated: {len(added)} added, {len(modified)} modified, {len(removed)} removed")
+                if persist:
+                    self.save_index()
+            return added, modified, removed
+
+    def embed_document(self, document_path):
+        """Loads, splits and embeds one markdown file without touching the index.
+
+        Returns:
+            tuple: The chunks of the file and their embeddings.
+        """
+        chunks = self.texts_to_vectors(UnstructuredMarkdownLoader(document_path).load())
+        embeddings = self.get_embeddings().embed_documents([chunk.page_content for chunk in chunks]) if chunks else []
+        return chunks, embeddings
+
+    def add_document_to_index(self, document_path, persist=True, fingerprint=None, embedded=None):
+        """Embeds one markdown file and adds its chunks, replacing the chunks of a previous version.
+
+        Parameters:
+            document_path (str): Markdown file to index.
+            persist (bool): Save the index afterwards.
+            fingerprint (dict, optional): Manifest entry of the file, computed when not given.
+            embedded (tuple, optional): (chunks, embeddings) from embed_document, computed when not given.
+
+        Returns:
+            int: Number of chunks indexed for the file.
+        """
+        document_path = os.path.normpath(document_path)
+        fingerprint = fingerprint or fingerprint_files([document_path])[document_path]
+        chunks, embeddings = embedded or self.embed_document(document_path)
+
+        with self.lock:
+            self.remove_document_from_index(document_path, persist=False)
+            if not chunks:
+                ids = []
+            elif self.index is None:
+                self.index = self.initialize_vector_db(chunks, embeddings)
+                ids = list(self.index.index_to_docstore_id.values())
+                self.lexical_index = None
+            else:
+                texts = [chunk.page_content for chunk in chunks]
+                ids = self.index.add_embeddings(list(zip(texts, embeddings)), metadatas=[chunk.metadata for chunk in chunks])
+                if self.lexical_index is not None:
+                    for doc_id, chunk in zip(ids, chunks):
+                        self.lexical_index.add(doc_id, chunk.page_content)
+            self.manifest["files"][document_path] = {**fingerprint, "ids": ids}
+            self.result_cache.clear()
+            if persist:
+                self.save_index()
+        return len(ids)
+
+    def update_document_in_index(self, document_path, persist=True):
+        """Re-embeds a file only if its content hash changed since it was indexed.
+
+        Returns:
+            bool: True if the file was re-indexed.
+        """
+        document_path = os.path.normpath(document_path)
+        with self.lock:
+            indexed = self.manifest["files"].get(document_path)
+        fingerprint = fingerprint_files([document_path], {document_path: indexed} if indexed else None)[document_path]
+        if indexed and indexed["sha256"] == fingerprint["sha256"]:
+            with self.lock:
+                indexed.update(fingerprint)
+            return False
+        self.add_document_to_index(document_path, persist=persist, fingerprint=fingerprint)
+        return True
+
+    def remove_document_from_index(self, document_path, persist=True):
+        """Deletes every chunk that was built from the given file.
+
+        Returns:
+            int: Number of chunks removed.
+        """
+        document_path = os.path.normpath(document_path)
+        with self.lock:
+            entry = self.manifest["files"].pop(document_path, None)
+            ids = entry.get("ids", []) if entry else []
+            if ids and self.index is not None:
+                self.index.delete(ids)
+                if self.lexical_index is not None:
+                    for doc_id in ids:
+                        self.lexical_index.remove(doc_id)
+                self.result_cache.clear()
+            if persist and entry:
+                self.save_index()
+        return len(ids)
+
+    def get_embeddings(self):
+        """Returns the embedding model, loading it on first use. Query embeddings are cached."""
+        if self.embeddings is None:
+            self.embeddings = CachedQueryEmbeddings(HuggingFaceEmbeddings(
+                model_name=self.model_name, model_kwargs=self.model_kwargs, encode_kwargs=self.encode_kwargs
+            ), maxsize=self.query_cache_size)
+        return self.embeddings
+
     def read_md_files(self):
         loader_md = DirectoryLoader(self.content_directory, glob="**/*.md", show_progress=True, loader_cls=UnstructuredMarkdownLoader)
 
@@ -52,34 +306,239 @@ class VectorDatabaseManager:
 
         # md_data_splits = recur_splitter.split_documents(md_data)
         chunks = []
-        splitter = MarkdownTextSplitter(chunk_size=512, chunk_overlap=0)
+        splitter = MarkdownTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
         for chunk in splitter.split_documents(md_data):
             chunks.append(chunk)
         return chunks
 
-    def initialize_vector_db(self, vectors):
-        hf_embeddings = HuggingFaceEmbeddings(
-            model_name=self.model_name, model_kwargs=self.model_kwargs, encode_kwargs=self.encode_kwargs
-        )
+    def initialize_vector_db(self, vectors, embeddings=None):
+        if self.index_type == 'flat' and embeddings is None:
+            return StableIdFAISS.from_documents(documents=vectors, embedding=self.get_embeddings())
 
-        vectordb = FAISS.from_documents(documents=vectors, embedding=hf_embeddings)
+        texts = [chunk.page_content for chunk in vectors]
+        if embeddings is None:
+            embeddings = self.get_embeddings().embed_documents(texts)
+        if self.index_type == 'flat':
+            return StableIdFAISS.from_embeddings(list(zip(texts, embeddings)), self.get_embeddings(), metadatas=[chunk.metadata for chunk in vectors])
+        vectordb = self.create_vector_store(embeddings)
+        vectordb.add_embeddings(list(zip(texts, embeddings)), metadatas=[chunk.metadata for chunk in vectors])
         return vectordb
 
-    def retrieve_documents(self, query, k=3, score_threshold=0.1):
+    def index_params(self):
+        """Parameters a saved index was built with; changing any of them requires a rebuild."""
+        return {"index_type": self.index_type, **self.index_kwargs()}
+
+    def index_kwargs(self):
+        return {"nlist": self.nlist, "pq_m": self.pq_m, "hnsw_m": self.hnsw_m}
+
+    def create_vector_store(self, training_vectors):
+        """Creates an empty vector store of the configured index type, trained on a sample of training_vectors."""
+        training_vectors = np.asarray(training_vectors, dtype=np.float32)
+        if len(training_vectors) > self.train_size:
+            sample = np.random.default_rng(0).choice(len(training_vectors), self.train_size, replace=False)
+            training_vectors = training_vectors[sample]
+
+        index = build_faiss_index(self.index_type, training_vectors.shape[1], training_vectors, **self.index_kwargs())
+        set_search_params(index, nprobe=self.nprobe, ef_search=self.ef_search)
+        return create_vector_store(self.get_embeddings(), index)
+
+    @metrics.timed("retrieve_documents", method="vector")
+    def retrieve_documents(self, query, k=3, score_threshold=0.1, as_dataframe=False):
+        """Retrieves the chunks most relevant to a query.
+
+        Returns:
+            list: One record per chunk with its "Retrieved Chunks", "Relevance Score" and "Source", ready to be
+                serialized as JSON. With as_dataframe=True, the same records as a pandas DataFrame.
+        """
         # Retrieve similar chunks based on relevance with metadata
-        similar_chunks = self.index.similarity_search_with_relevance_scores(query, k=k, score_threshold=score_threshold)
+        key = (query, k, score_threshold)
+        similar_chunks = self.result_cache.get(key)
+        if similar_chunks is None:
+            with self.lock:
+                similar_chunks = self.index.similarity_search_with_relevance_scores(query, k=k, score_threshold=score_threshold)
+                # Cached under the lock, so an index change cannot clear the cache before a stale result is put
+                self.result_cache.put(key, similar_chunks)
+
+        return self.format_results(similar_chunks, as_dataframe)
+
+    def retrieve_documents_batch(self, queries, k=3, score_threshold=0.1, as_dataframe=False):
+        """Retrieves the documents of several queries with one encoder pass and one FAISS search.
+
+        Parameters:
+            queries (list): Search queries.
+            k (int): Number of chunks retrieved per query.
+            score_threshold (float): Minimum relevance score of a retrieved chunk.
+
+        Returns:
+            list: One result per query, in the same form as retrieve_documents.
+        """
+        return [self.format_results(similar_chunks, as_dataframe) for similar_chunks in self.search_batch(queries, k, score_threshold)]
+
+    def search_batch(self, queries, k=3, score_threshold=0.1):
+        """Returns the (document, score) pairs of each query, embedding the uncached ones in one batch."""
+        results = {query: self.result_cache.get((query, k, score_threshold)) for query in dict.fromkeys(queries)}
+        missing = [query for query, similar_chunks in results.items() if similar_chunks is None]
+
+        if missing:
+            with metrics.timer("embed_queries"):
+                vectors = np.array(self.get_embeddings().embed_queries(missing), dtype=np.float32)
+            with self.lock:
+                if getattr(self.index, "_normalize_L2", False):
+                    import faiss
+                    faiss.normalize_L2(vectors)
+                with metrics.timer("vector_search"):
+                    distances, indices = self.index.search_labels(vectors, k)
+                relevance_score_fn = self.index._select_relevance_score_fn()
+
+                for query, row_distances, row_indices in zip(missing, distances, indices):
+                    similar_chunks = []
+                    for distance, position in zip(row_distances, row_indices):
+                        if position == -1:
+                            continue
+                        doc_id = self.index.index_to_docstore_id[position]
+                        score = relevance_score_fn(distance)
+                        if score >= score_threshold:
+                            similar_chunks.append((self.index.docstore.search(doc_id), score))
+                    results[query] = similar_chunks
+                    self.result_cache.put((query, k, score_threshold), similar_chunks)
+
+        return [results[query] for query in queries]
+
+    def get_lexical_index(self):
+        """Returns the BM25 index of the chunks, building it from the docstore on first use."""
+        with self.lock:
+            if self.lexical_index is None:
+                lexical_index = BM25Index()
+                if self.index is not None:
+                    for doc_id in self.index.index_to_docstore_id.values():
+                        lexical_index.add(doc_id, self.index.docstore.search(doc_id).page_content)
+                self.lexical_index = lexical_index
+            return self.lexical_index
+
+    def chunk_relevance(self, doc_ids, queries):
+        """Best vector relevance of each chunk to any of the queries, for chunks found by BM25 alone.
 
-        # Unpack the tuples to separate page content and scores
-        retrieved_text = [chunk[0].page_content for chunk in similar_chunks]
-        relevance_scores = [chunk[1] for chunk in similar_chunks]
-        sources = [chunk[0].metadata.get('source', 'Unknown source') for chunk in similar_chunks]
+        The chunk vectors are read back from the index, so only the queries are embedded, mostly from
+        the query cache.
+
+        Returns:
+            dict: Relevance score of each doc_id still in the index.
+        """
+        vectors = np.array(self.get_embeddings().embed_queries(queries), dtype=np.float32)
+        with self.lock:
+            if getattr(self.index, "_normalize_L2", False):
+                import faiss
+                faiss.normalize_L2(vectors)
+            stored = self.index.vectors_of(doc_ids)
+            relevance_score_fn = self.index._select_relevance_score_fn()
+            inner_product = self.index.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+
+        scores = {}
+        for doc_id, chunk_vector in stored.items():
+            # The distance FAISS itself returns: inner product, or squared L2
+            if inner_product:
+                distance = float((vectors @ chunk_vector).max())
+            else:
+                distance = float(((vectors - chunk_vector) ** 2).sum(axis=1).min())
+            scores[doc_id] = relevance_score_fn(distance)
+        return scores
+
+    @staticmethod
+    def chunk_key(document):
+        """Identifies a chunk across the lexical and vector results."""
+        return document.metadata.get('source'), document.page_content
+
+    @metrics.timed("retrieve_documents", method="hybrid")
+    def retrieve_hybrid(self, queries, k=3, score_threshold=0.1, as_dataframe=False):
+        """Retrieves the chunks most relevant to several queries from both the BM25 and the FAISS index.
+
+        Every query is run against the BM25 index without its stopwords. Single-term queries with lexical hits,
+        such as the extracted keywords, are answered by it alone without a FAISS search; the other queries are
+        embedded and searched in one batched FAISS search. BM25 hits that FAISS did not return are scored
+        against the embedded queries from their stored vectors, so the score_threshold applies to every chunk.
+        All the rankings are fused with reciprocal rank fusion.
+
+        Parameters:
+            queries (list): Keywords and free-text queries, e.g. the extracted issue.
+            k (int): Number of chunks returned, and retrieved per query and index.
+            score_threshold (float): Minimum vector relevance score of a chunk.
+
+        Returns:
+            list: The k best chunks in the same form as retrieve_documents, with their vector relevance as
+                "Relevance Score" and the reciprocal rank fusion score as "Fused Score".
+        """
+        queries = [query for query in dict.fromkeys(queries) if query and query.strip()]
+        rankings = []
+        documents = {}
+        lexical_ids = {}
+        vector_queries = []
+        with self.lock:
+            lexical_index = self.get_lexical_index()
+            for query in queries:
+                terms = keyword_extractor.tokens(query)
+                ranking = []
+                for doc_id, _ in lexical_index.search_terms(terms, k):
+                    document = self.index.docstore.search(doc_id)
+                    key = self.chunk_key(document)
+                    documents[key] = document
+                    lexical_ids[key] = doc_id
+                    ranking.append(key)
+                if ranking:
+                    rankings.append(ranking)
+                # Lexical fast path for exact terms
+                if not (ranking and len(terms) == 1):
+                    vector_queries.append(query)
+
+        relevance = {}
+        if vector_queries:
+            for similar_chunks in self.search_batch(vector_queries, k, score_threshold):
+                ranking = []
+                for document, score in similar_chunks:
+                    key = self.chunk_key(document)
+                    documents[key] = document
+                    relevance[key] = max(score, relevance.get(key, score))
+                    ranking.append(key)
+                rankings.append(ranking)
+
+        lexical_only = {key: doc_id for key, doc_id in lexical_ids.items() if key not in relevance}
+        if lexical_only:
+            scores = self.chunk_relevance(list(lexical_only.values()), vector_queries or queries)
+            for key, doc_id in lexical_only.items():
+                if doc_id in scores:
+                    relevance[key] = scores[doc_id]
+        rankings = [[key for key in ranking if key in relevance and relevance[key] >= score_threshold] for ranking in rankings]
+
+        fused = reciprocal_rank_fusion(rankings, k)
+        return self.format_results(
+            [(documents[key], relevance[key]) for key, _ in fused], as_dataframe, fused_scores=[score for _, score in fused]
+        )
+
+    def format_results(self, similar_chunks, as_dataframe=False, fused_scores=None):
+        """Turns (document, score) pairs into plain records, or a DataFrame of them for notebooks.
+
+        With fused_scores, each record also gets its hybrid search score as "Fused Score".
+        """
+        records = [
+            {
+                "Retrieved Chunks": document.page_content,
+                "Relevance Score": float(score),
+                "Source": document.metadata.get('source', 'Unknown source')
+            }
+            for document, score in similar_chunks
+        ]
+        columns = ["Retrieved Chunks", "Relevance Score", "Source"]
+        if fused_scores is not None:
+            for record, fused_score in zip(records, fused_scores):
+                record["Fused Score"] = float(fused_score)
+            columns.append("Fused Score")
+        if not as_dataframe:
+            return records
+
+        # pandas is only needed for this notebook-friendly view
+        import pandas as pd
 
         # Create a DataFrame to neatly display the results
-        retrieved_chunks = pd.DataFrame({
-            "Retrieved Chunks": retrieved_text,
-            "Relevance Score": relevance_scores,
-            "Source": sources
-        })
+        retrieved_chunks = pd.DataFrame(records, columns=columns)
 
         # # Optionally, adjust display settings for better readability
         # pd.set_option('display.max_colwidth', None)
@@ -1,13 +1,14 @@
 # helpers.py
 
 import json
+import logging
+import os
 import re
-import string
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.probability import FreqDist
-import requests
+from utilities.keyword_extractor import keyword_extractor
+from utilities.metrics import metrics
+
+# Set once the missing requests-toolbelt has been reported, so the warning is not repeated per file
+_toolbelt_warned = False
 
 def pretty_print_json(data):
     """Prints JSON data in a readable format.
@@ -48,49 +49,62 @@ def validate_email(email):
     pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
     return re.match(pattern, email) is not None
 
-def top_words(data_json, podium=3):
-
-    # Load data
-    data = json.loads(data_json)
-
-    # Extract textual data
-    textual_content = " ".join([data['data'][key] for key in data['data'] if isinstance(data['data'][key], str)])
-
-    # Remove punctuation
-    translator = str.maketrans('', '', string.punctuation)
-    textual_content = textual_content.translate(translator)
-
-    # Tokenize text
-    tokens = word_tokenize(textual_content, language='portuguese')
-
-    # Remove stopwords
-    stop_words = set(stopwords.words('portuguese'))
-    filtered_tokens = [word for word in tokens if word.lower() not in stop_words]
+@metrics.timed("top_words")
+def top_words(data, podium=3):
+    """Returns the podium most frequent keywords of a processed conversation, without accents.
 
-    # Frequency distribution of words
-    freq_dist = FreqDist(filtered_tokens)
-
-    # Get the most common words
-    keywords = freq_dist.most_common(3)
+    Parameters:
+        data (dict or str): The processed conversation, parsed or as JSON.
+        podium (int): Number of keywords returned.
 
-    return keywords
+    Returns:
+        list: (word, count) pairs, most frequent first.
+    """
+    return keyword_extractor.top_words(data, podium)
 
-def transcribe_audio(tts_server, file_path):
+@metrics.timed("transcribe_audio")
+def transcribe_audio(tts_server, file_path, stream_threshold=None):
     """
     Sends a POST request to a local server to transcribe a WAV file.
 
+    The request goes through the shared connection pool, with timeouts and retries on 5xx and connection errors.
+    Files larger than stream_threshold bytes are streamed from disk instead of being read into memory when
+    requests_toolbelt is installed; such uploads cannot be rewound, so they are not retried.
+
     Args:
         file_path (str): The path to the .wav audio file to be transcribed.
+        stream_threshold (int, optional): Size in bytes above which the file is streamed. Defaults to
+            config.audio_stream_threshold.
 
     Returns:
         str: The transcribed text from the audio file.
     """
+    global _toolbelt_warned
+    import requests
+    from config.config_manager import config
+    from utilities.http_client import http_request
 
     url = (f"{tts_server}/transcribe")
-    files = {'audio': (file_path, open(file_path, 'rb'), 'audio/wav')}
+    audio_file = open(file_path, 'rb')
+    stream_threshold = config.audio_stream_threshold if stream_threshold is None else stream_threshold
 
     try:
-        response = requests.post(url, files=files)
+        encoder = None
+        if os.path.getsize(file_path) > stream_threshold:
+            # Streams large multipart uploads from disk instead of building them in memory.
+            # Imported here, so importing this module does not load requests
+            try:
+                from requests_toolbelt.multipart.encoder import MultipartEncoder
+                encoder = MultipartEncoder(fields={'audio': (os.path.basename(file_path), audio_file, 'audio/wav')})
+            except ImportError:
+                if not _toolbelt_warned:
+                    _toolbelt_warned = True
+                    logging.warning("requests-toolbelt is not installed: large WAV files are read into memory "
+                                    "instead of streamed (pip install requests-toolbelt).")
+        if encoder is not None:
+            response = http_request("POST", url, endpoint="transcribe", retry=False, data=encoder, headers={'Content-Type': encoder.content_type})
+        else:
+            response = http_request("POST", url, endpoint="transcribe", files={'audio': (file_path, audio_file, 'audio/wav')})
         response.raise_for_status()  # Raises an HTTPError for bad responses (4XX, 5XX)
 
         # Assuming the response body contains the transcript directly
@@ -104,4 +118,6 @@ def transcribe_audio(tts_server, file_path):
     except requests.exceptions.RequestException as err:
         print(f"OOps: Something Else: {err}")
     finally:
-        files['audio'][1].close()  # Ensure the file is closed after the request
+        audio_file.close()  # Ensure the file is closed after the request
+    # Only reached when the request failed and None is returned
+    metrics.inc("errors_total", stage="transcribe_audio")
@@ -0,0 +1,103 @@
+# http_client.py
+
+import threading
+import time
+from config.config_manager import config
+
+class EndpointMetrics:
+    """Latency and error counters of outgoing HTTP calls, grouped by endpoint name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, seconds, ok=True):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if not ok:
+                stats["errors"] += 1
+
+    def snapshot(self):
+        """Returns a copy of the counters with the average latency of each endpoint."""
+        with self._lock:
+            return {
+                endpoint: {**stats, "avg_seconds": stats["total_seconds"] / stats["count"] if stats["count"] else 0.0}
+                for endpoint, stats in self._endpoints.items()
+            }
+
+endpoint_metrics = EndpointMetrics()
+
+_sessions = {}
+_session_lock = threading.Lock()
+
+def create_session(pool_size=10, retries=3, backoff_factor=0.5):
+    """Creates a requests Session with a keep-alive connection pool and retries.
+
+    Connection errors and 500/502/503/504 responses are retried with exponential backoff.
+
+    Parameters:
+        pool_size (int): Connections kept open per host.
+        retries (int): Maximum number of retries of a request.
+        backoff_factor (float): Base of the exponential backoff between retries, in seconds.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=None,  # Retry POST too: transcription and generation requests are idempotent
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session(retry=True):
+    """Returns the session shared by the whole process, creating it from the config on first use.
+
+    Parameters:
+        retry (bool): False returns a session that never retries, for request bodies that cannot be rewound.
+    """
+    session = _sessions.get(retry)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retry)
+            if session is None:
+                session = create_session(config.http_pool_size, config.http_retries if retry else 0, config.http_backoff_factor)
+                _sessions[retry] = session
+    return session
+
+def http_request(method, url, endpoint, timeout=None, retry=True, **kwargs):
+    """Sends a request through the shared session and records its latency under endpoint.
+
+    Parameters:
+        method (str): HTTP method.
+        url (str): Target URL.
+        endpoint (str): Name the latency is recorded under, e.g. 'transcribe'.
+        timeout (float or tuple, optional): Defaults to (config.http_connect_timeout, config.http_read_timeout).
+        retry (bool): Retry on connection errors and 5xx responses.
+        **kwargs: Passed to requests.Session.request.
+
+    Returns:
+        requests.Response: The response; raise_for_status is left to the caller.
+    """
+    timeout = timeout or (config.http_connect_timeout, config.http_read_timeout)
+    start = time.perf_counter()
+    ok = False
+    try:
+        response = get_session(retry).request(method, url, timeout=timeout, **kwargs)
+        ok = response.status_code < 400
+        return response
+    finally:
+        endpoint_metrics.record(endpoint, time.perf_counter() - start, ok)
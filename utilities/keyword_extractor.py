@@ -0,0 +1,68 @@
+# keyword_extractor.py
+
+import json
+import re
+import unicodedata
+from collections import Counter
+
+# Lower-case, accent-folded words; e-mails, phone numbers and hyphenated words stay single tokens
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.@_-][a-z0-9]+)*")
+
+def fold(text):
+    """Lower-cases text and removes its accents, e.g. 'Manutenção' -> 'manutencao'."""
+    return unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+
+def tokenize(text):
+    """Splits text into folded tokens; also the tokenizer of the BM25 index, so keywords match its terms."""
+    return _TOKEN.findall(fold(text))
+
+class KeywordExtractor:
+    """Most frequent words of the extracted fields of a conversation, used as vector search keywords.
+
+    The stopwords are loaded once into a frozenset of accent-folded words, and the text is folded and
+    tokenized with a single regex, so the keywords come out without accents.
+    """
+
+    def __init__(self, language='portuguese', stopwords=None):
+        """
+        Parameters:
+            language (str): Language of the NLTK stopword list loaded on first use.
+            stopwords (iterable, optional): Stopwords to use instead of the NLTK list.
+        """
+        self.language = language
+        self._stopwords = frozenset(fold(word) for word in stopwords) if stopwords is not None else None
+
+    @property
+    def stopwords(self):
+        if self._stopwords is None:
+            # nltk is only needed here; importing it lazily keeps application startup fast
+            from nltk.corpus import stopwords
+            self._stopwords = frozenset(fold(word) for word in stopwords.words(self.language))
+        return self._stopwords
+
+    def tokens(self, text):
+        stopwords = self.stopwords
+        return [token for token in tokenize(text) if token not in stopwords]
+
+    def top_words(self, data, podium=3):
+        """Returns the podium most frequent words of the text fields of a processed conversation.
+
+        Parameters:
+            data (dict or str): The processed conversation, with the extracted fields under 'data'.
+                A JSON string is parsed first.
+            podium (int): Number of words returned.
+
+        Returns:
+            list: (word, count) pairs, most frequent first.
+        """
+        if isinstance(data, str):
+            data = json.loads(data)
+        fields = data.get('data') or {}
+        text = " ".join(value for value in fields.values() if isinstance(value, str))
+        return Counter(self.tokens(text)).most_common(podium)
+
+keyword_extractor = KeywordExtractor()
+
+# Example usage:
+# keyword_extractor.top_words({"data": {"issue": "Demora na manutenção dos semáforos"}}, podium=1)
+# -> [('demora', 1)]
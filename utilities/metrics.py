@@ -0,0 +1,276 @@
+# metrics.py
+
+import bisect
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds of the latency histogram buckets, from cache hits to long generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_HELP = {
+    "llm_invoke": "LLM chain invocations by template type.",
+    "llm_stream": "Streamed LLM generations by template type.",
+    "retrieve_documents": "Related document retrievals by search method.",
+    "embed_queries": "Batched query embeddings of the vector search.",
+    "vector_search": "FAISS searches of a batch of query vectors.",
+    "top_words": "Keyword extraction of processed conversations.",
+    "transcribe_audio": "Requests to the transcription server.",
+    "send_message": "Kafka produce calls (queueing the record, not its delivery).",
+    "conversation": "Whole conversations, from the LLM chains to the related documents.",
+}
+
+# Trace of the conversation being processed. The LLM chain threads run in a copy of the submitting
+# context (contextvars.copy_context), so their spans land in the same trace.
+_current_trace = contextvars.ContextVar("conversation_trace", default=None)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    """Renders (key, value) pairs as a Prometheus label set, e.g. {template="extraction"}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+class ConversationTrace:
+    """Spans of the stages run for one conversation, written as one JSON line when it ends."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.fields = {}
+        self.spans = []
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def add_span(self, stage, labels, start, seconds, error=None):
+        span = {"stage": stage, **dict(labels), "start": round(start - self.started, 6), "seconds": round(seconds, 6)}
+        if error:
+            span["error"] = error
+        self.spans.append(span)  # list.append is atomic, so the chain threads can share a trace
+
+    def to_dict(self):
+        return {**self.fields, "total_seconds": round(time.perf_counter() - self.started, 6), "spans": self.spans}
+
+class _NullTrace:
+    def set(self, **fields):
+        pass
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TRACE = _NullTrace()
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("registry", "stage", "labels", "start")
+
+    def __init__(self, registry, stage, labels):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        self.registry.observe(f"{self.stage}_seconds", seconds, self.labels)
+        if exc_type is not None:
+            self.registry.inc("errors_total", stage=self.stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(self.stage, self.labels, self.start, seconds, exc_type.__name__ if exc_type else None)
+        return False
+
+class MetricsRegistry:
+    """Latency histograms and counters of the pipeline stages, rendered in the Prometheus text format.
+
+    The registry is disabled until enable() is called: timer() then returns a shared no-op context
+    manager and timed functions are called directly, so the instrumentation costs an attribute check.
+    Statistics kept elsewhere (HTTP endpoints, JSON parsing, LLM cache) are read by collectors at
+    render time instead of being counted twice.
+    """
+
+    def __init__(self, namespace="hftgi", buckets=LATENCY_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.enabled = False
+        self.trace_path = None
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+
+    def enable(self, trace_path=None):
+        """Starts recording; with trace_path, every traced conversation is appended to it as a JSON line."""
+        self.enabled = True
+        self.trace_path = trace_path or None
+
+    def timer(self, stage, **labels):
+        """Context manager recording the duration of a stage in the {stage}_seconds histogram.
+
+        An exception raised inside also increments errors_total{stage=...}.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, tuple(sorted(labels.items())))
+
+    def timed(self, stage, **labels):
+        """Decorator timing every call of a function as a stage (see timer)."""
+        label_items = tuple(sorted(labels.items()))
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, stage, label_items):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, name, seconds, labels=()):
+        key = (name, labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_collector(self, collect):
+        """Registers a callable returning (name, type, labels dict, value) samples, read at render time."""
+        self._collectors.append(collect)
+
+    @contextlib.contextmanager
+    def trace(self, stage="conversation"):
+        """Times a conversation as a stage and, with a trace path, records the spans of its stages.
+
+        Yields the trace, whose set() adds fields such as the conversation id to its JSON line.
+        """
+        if not self.enabled:
+            yield _NULL_TRACE
+            return
+        trace = ConversationTrace() if self.trace_path else None
+        token = _current_trace.set(trace) if trace is not None else None
+        try:
+            with _Timer(self, stage, ()):
+                yield trace if trace is not None else _NULL_TRACE
+        finally:
+            if token is not None:
+                _current_trace.reset(token)
+                self.write_trace(trace)
+
+    def write_trace(self, trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._trace_lock:
+            with open(self.trace_path, 'a', encoding='utf-8') as file:
+                file.write(line)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        described = set()
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            metric = f"{self.namespace}_{name}"
+            if metric not in described:
+                described.add(metric)
+                stage = name[:-len("_seconds")]
+                if stage in STAGE_HELP:
+                    lines.append(f"# HELP {metric} {STAGE_HELP[stage]}")
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), buckets):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+
+        samples = [(name, "counter", labels, value) for (name, labels), value in sorted(counters.items())]
+        for collect in self._collectors:
+            try:
+                samples.extend(
+                    (name, metric_type, tuple(sorted(labels.items())), value)
+                    for name, metric_type, labels, value in collect()
+                )
+            except Exception as e:
+                logging.error(f"Metrics collector failed: {e}")
+        # The samples of a metric must be contiguous; the sort is stable, so labels keep their order
+        samples.sort(key=lambda sample: sample[0])
+        for name, metric_type, labels, value in samples:
+            metric = f"{self.namespace}_{name}"
+            if metric not in described:
+                described.add(metric)
+                lines.append(f"# TYPE {metric} {metric_type}")
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves the registry at http://host:port/metrics from a daemon thread, for Prometheus to scrape."""
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are not worth a log line each
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Serving metrics at http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+metrics = MetricsRegistry()
+
+# Example usage:
+# metrics.enable(trace_path="traces.jsonl")
+# MetricsServer(metrics, port=9100).start()
+# with metrics.trace() as trace:
+#     with metrics.timer("llm_invoke", template="extraction"):
+#         ...
+#     trace.set(conversation_id="...")